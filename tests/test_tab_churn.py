@@ -0,0 +1,87 @@
+"""Opening and closing tabs over and over must not leak widgets or memory"""
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import tkinter as tk
+    tk.Tk().destroy()
+    DISPLAY_ERROR = None
+except Exception as e:  # no display, or Tk not installed
+    DISPLAY_ERROR = str(e)
+
+transparent_notes = None
+if DISPLAY_ERROR is None:
+    try:
+        import transparent_notes
+    except ImportError:  # pystray / Pillow not installed
+        pass
+
+
+def count_widgets(widget):
+    """Count a widget and all of its descendants"""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def count_tcl_commands(root):
+    """Count Tcl commands, which include every Python callback bound or scheduled"""
+    return len(root.tk.call('info', 'commands'))
+
+
+@unittest.skipIf(DISPLAY_ERROR, f"no display: {DISPLAY_ERROR}")
+@unittest.skipIf(transparent_notes is None, "application dependencies are not installed")
+class TabChurnTest(unittest.TestCase):
+    CYCLES = 10000
+
+    def setUp(self):
+        # Keep settings, history and background workers out of the measurement
+        self.appdata = tempfile.TemporaryDirectory()
+        os.environ['APPDATA'] = self.appdata.name
+        settings_dir = os.path.join(self.appdata.name, 'TransparentNotes')
+        os.makedirs(settings_dir)
+        with open(os.path.join(settings_dir, 'settings.json'), 'w') as f:
+            json.dump({'spell_check': False, 'autocomplete': False}, f)
+
+        self.app = transparent_notes.TransparentNotes()
+        self.app.root.update()
+
+    def tearDown(self):
+        self.app.root.destroy()
+        self.appdata.cleanup()
+
+    def churn(self, cycles):
+        for i in range(cycles):
+            tab_name = self.app.create_new_tab()
+            self.app.tabs[tab_name]['text_area'].insert('1.0', f"note {i}\n" * 5)
+            self.app.close_tab(tab_name)
+            if i % 100 == 0:
+                self.app.root.update()
+        self.app.root.update()
+
+    def test_open_close_cycles_do_not_grow(self):
+        # Warm up so the widget pools and caches are filled before measuring
+        self.churn(50)
+        widgets_before = count_widgets(self.app.root)
+        commands_before = count_tcl_commands(self.app.root)
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+
+        self.churn(self.CYCLES)
+
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        growth = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+
+        self.assertEqual(count_widgets(self.app.root), widgets_before)
+        self.assertEqual(count_tcl_commands(self.app.root), commands_before)
+        self.assertEqual(len(self.app.tabs), 1)
+        self.assertLess(growth, 256 * 1024, f"memory grew by {growth} bytes over {self.CYCLES} cycles")
+
+
+if __name__ == '__main__':
+    unittest.main()
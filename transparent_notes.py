@@ -1,22 +1,696 @@
 import tkinter as tk
-from tkinter import colorchooser, filedialog
+from tkinter import colorchooser, filedialog, messagebox
 import json
+import array
+import base64
+import bisect
+import collections
+import difflib
+import hashlib
+import heapq
+import html
+import mmap
+import queue
+import re
 import pystray
 from PIL import Image, ImageTk
 import threading
 import os
 import sys
+import time
+import uuid
+import zlib
+
+# Words as the spell checker sees them
+SPELL_WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+# Words and identifiers offered for completion
+AUTOCOMPLETE_WORD_RE = re.compile(r"[^\W\d]\w{2,}")
+
+# Characters that start inline Markdown syntax
+MARKDOWN_SPECIAL_RE = re.compile(r"([\\`*_\[\]])")
+
+class SpellDictionary:
+    """Word list used as a trie without building one in memory.
+    
+    The words are kept lowercased and sorted in a memory-mapped file. A trie
+    node is the range of words sharing a prefix, found by binary search, so
+    lookups and suggestion searches walk the trie while only the line
+    offsets live in Python memory.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        # Start offset of every word plus one past the last word
+        self.offsets = array.array('L', [0])
+        position = self.data.find(b'\n')
+        while position != -1:
+            self.offsets.append(position + 1)
+            position = self.data.find(b'\n', position + 1)
+        self.count = len(self.offsets) - 1
+
+    def word(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def _lower_bound(self, key, lo=0, hi=None):
+        hi = self.count if hi is None else hi
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.word(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, word):
+        key = word.lower().encode('utf-8')
+        i = self._lower_bound(key)
+        return i < self.count and self.word(i) == key
+
+    def _children(self, prefix, lo, hi):
+        """Yield (next byte, range) for each child of the node prefix spans"""
+        depth = len(prefix)
+        i = lo
+        while i < hi:
+            word = self.word(i)
+            if len(word) == depth:
+                i += 1
+                continue
+            child = word[:depth + 1]
+            child_hi = self._lower_bound(child + b'\xff', i, hi)
+            yield child, i, child_hi
+            i = child_hi
+
+    def suggest(self, word, max_distance=2, limit=6):
+        """Return dictionary words within max_distance edits, closest first"""
+        target = word.lower().encode('utf-8')
+        found = []
+        
+        # Depth-first walk carrying edit distance rows (with transpositions)
+        # per trie node; short words only get one edit
+        max_distance = min(max_distance, 1 if len(target) <= 4 else max_distance)
+        stack = [(b'', 0, self.count, list(range(len(target) + 1)), None)]
+        while stack:
+            prefix, lo, hi, row, previous_row = stack.pop()
+            for child, child_lo, child_hi in self._children(prefix, lo, hi):
+                byte = child[-1]
+                new_row = [row[0] + 1]
+                for j in range(1, len(target) + 1):
+                    cost = min(new_row[j - 1] + 1, row[j] + 1,
+                               row[j - 1] + (target[j - 1] != byte))
+                    if (previous_row is not None and j > 1 and byte == target[j - 2]
+                            and prefix[-1] == target[j - 1]):
+                        cost = min(cost, previous_row[j - 2] + 1)
+                    new_row.append(cost)
+                if min(new_row) > max_distance:
+                    continue
+                if new_row[-1] <= max_distance and self.word(child_lo) == child:
+                    found.append((new_row[-1], abs(len(child) - len(target)), child))
+                stack.append((child, child_lo, child_hi, new_row, row))
+        
+        found.sort()
+        suggestions = []
+        for distance, length_change, candidate in found[:limit]:
+            suggestion = candidate.decode('utf-8', 'replace')
+            if word[:1].isupper():
+                suggestion = suggestion[:1].upper() + suggestion[1:]
+            suggestions.append(suggestion)
+        return suggestions
+
+
+class PrefixIndex:
+    """Word trie that keeps a cached top-k completion list at every node.
+    
+    Words are ranked by use count, then by how recently they were last
+    added. Each cached list holds the best words of its subtree in order,
+    with a few spare entries beyond k. Adding or removing a word updates the
+    lists along its path in place; a list that drops below k entries is
+    refilled by merging its children's lists instead of rescanning the
+    subtree. Nodes near the root always keep a list, so only the small
+    subtrees of long prefixes are ever scanned, once, on their first lookup.
+    """
+
+    class Node:
+        __slots__ = ('children', 'count', 'last_used', 'words', 'top')
+
+        def __init__(self):
+            self.children = {}
+            self.count = 0
+            self.last_used = 0
+            self.words = 0      # words with a count in this subtree
+            self.top = None
+
+    def __init__(self, k=8, eager_depth=3):
+        self.k = k
+        self.capacity = 2 * k  # spare entries absorb removals before a refill
+        self.eager_depth = eager_depth
+        self.root = self.Node()
+        self.root.top = []
+        self.tick = 0
+
+    def _path(self, word, create=False):
+        path = [self.root]
+        node = self.root
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = self.Node()
+                if len(path) <= self.eager_depth:
+                    child.top = []  # kept up to date from the first word on
+            node = child
+            path.append(node)
+        return path
+
+    def add(self, word, count=1):
+        self.tick += 1
+        path = self._path(word, create=True)
+        node = path[-1]
+        is_new = node.count == 0
+        node.count += count
+        node.last_used = self.tick
+        
+        entry = (node.count, node.last_used, word)
+        for step in path:
+            if is_new:
+                step.words += 1
+            top = step.top
+            if top is None:
+                continue
+            if len(top) + 1 < step.words and (not top or entry < top[-1]):
+                continue  # ranks below words this list leaves out
+            # A word only moves up when it is added, so drop its old entry
+            top[:] = [item for item in top if item[2] != word]
+            top.append(entry)
+            top.sort(reverse=True)
+            if len(top) > self.capacity:
+                top.pop()
+
+    def remove(self, word, count=1):
+        path = self._path(word)
+        if path is None or path[-1].count == 0:
+            return
+        node = path[-1]
+        node.count = max(0, node.count - count)
+        
+        entry = (node.count, node.last_used, word)
+        for step in path:
+            if not node.count:
+                step.words -= 1
+            top = step.top
+            if top is None:
+                continue
+            old = next((i for i, item in enumerate(top) if item[2] == word), None)
+            if old is None:
+                continue
+            del top[old]
+            # Keep the word only while nothing left out could outrank it
+            if node.count and (len(top) + 1 == step.words or (top and entry > top[-1])):
+                top.append(entry)
+                top.sort(reverse=True)
+        
+        # Prune branches that no longer hold any word
+        for depth in range(len(word), 0, -1):
+            node = path[depth]
+            if node.count or node.children:
+                break
+            del path[depth - 1].children[word[depth - 1]]
+
+    def _scan(self, node, prefix):
+        """Build a node's list by walking its whole subtree"""
+        candidates = []
+        stack = [(node, prefix)]
+        while stack:
+            current, word = stack.pop()
+            if current.count:
+                candidates.append((current.count, current.last_used, word))
+            stack.extend((child, word + char) for char, child in current.children.items())
+        node.top = heapq.nlargest(self.capacity, candidates)
+
+    def _refill(self, node, prefix):
+        """Rebuild a short list by merging the lists of the node's children"""
+        lists = [[(node.count, node.last_used, prefix)]] if node.count else []
+        cutoff = None
+        for char, child in node.children.items():
+            self._cached_top(child, prefix + char)
+            lists.append(child.top)
+            # Past the last entry of a partial list, its other words may rank higher
+            if len(child.top) < child.words and (cutoff is None or child.top[-1] > cutoff):
+                cutoff = child.top[-1]
+        merged = heapq.merge(*lists, reverse=True)
+        node.top = [entry for entry, _ in zip(merged, range(self.capacity))
+                    if cutoff is None or entry >= cutoff]
+
+    def _cached_top(self, node, prefix):
+        if node.top is None:
+            self._scan(node, prefix)
+        elif len(node.top) < min(self.k, node.words):
+            self._refill(node, prefix)
+        return node.top
+
+    def complete(self, prefix, limit=None):
+        """Return the best ranked words starting with prefix"""
+        path = self._path(prefix)
+        if path is None:
+            return []
+        top = self._cached_top(path[-1], prefix)
+        return [word for _, _, word in top[:limit if limit is not None else self.k]]
+
+
+class SyncedNote:
+    """Line-based replicated note that merges edits from several devices.
+    
+    Every line has a unique (clock, device) id and remembers the line it was
+    inserted after. Lines are ordered by walking that tree with newer ids
+    first, so all devices that have seen the same operations produce the same
+    text no matter in which order they read them. A line edited in place keeps
+    its id and takes the newest text written to it. Deleted lines are kept as
+    tombstones so later inserts can still be anchored to them, until every
+    device has seen the deletion and nothing that stays hangs off them.
+    """
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.lines = {}         # line id -> [after id, text, deleted]
+        self.children = {}      # after id -> ids inserted after it
+        self.early_deletes = set()
+        self.local_deletes = set()
+        self.owner_deletes = set()  # deletions already recorded by the line's owner
+        self.stamps = {}        # line id -> (clock, device) of its text, if set after insert
+        self.early_sets = {}    # line id -> (stamp, text) for lines not read yet
+        self.local_sets = set()
+        self.meta = None        # (clock, device, name, closed), last writer wins
+        self.local_meta = None
+        self.version = 0
+        self._visible = []
+        self._visible_version = 0
+
+    def apply(self, op):
+        """Apply one log operation; returns True if the note changed"""
+        kind = op.get('op')
+        if kind == 'ins':
+            line_id = tuple(op['id'])
+            if op.get('x'):
+                self.owner_deletes.add(line_id)
+            deleted = bool(op.get('x')) or line_id in self.early_deletes
+            # A compacted insert carries the stamp of the text it was written with
+            stamp = tuple(op['s']) if op.get('s') else line_id
+            if line_id in self.lines:
+                changed = self._set_text(line_id, stamp, op.get('text', '')) if not op.get('x') else False
+                if deleted and not self.lines[line_id][2]:
+                    self.lines[line_id][2] = True
+                    changed = True
+                if changed:
+                    self.version += 1
+                return changed
+            after = tuple(op['after']) if op.get('after') else None
+            self.lines[line_id] = [after, op.get('text', ''), deleted]
+            if stamp != line_id:
+                self.stamps[line_id] = stamp
+            self.children.setdefault(after, []).append(line_id)
+            self.early_deletes.discard(line_id)
+            if line_id in self.early_sets:
+                self._set_text(line_id, *self.early_sets.pop(line_id))
+        elif kind == 'set':
+            line_id = tuple(op['id'])
+            stamp = (op['c'], op['d'])
+            if op['d'] == self.device_id:
+                self.local_sets.add(line_id)
+            if line_id not in self.lines:
+                early = self.early_sets.get(line_id)
+                if early is None or stamp > early[0]:
+                    self.early_sets[line_id] = (stamp, op.get('text', ''))
+                return False
+            if not self._set_text(line_id, stamp, op.get('text', '')) or self.lines[line_id][2]:
+                return False
+        elif kind == 'del':
+            line_id = tuple(op['id'])
+            if op.get('d') == self.device_id:
+                self.local_deletes.add(line_id)
+            entry = self.lines.get(line_id)
+            if entry is None:
+                # The insert lives in another device's log we have not read yet
+                self.early_deletes.add(line_id)
+                return False
+            if entry[2]:
+                return False
+            entry[2] = True
+        elif kind == 'meta':
+            meta = (op['c'], op['d'], op.get('name'), bool(op.get('closed')))
+            if op['d'] == self.device_id:
+                self.local_meta = op
+            if self.meta is not None and meta[:2] <= self.meta[:2]:
+                return False
+            self.meta = meta
+        else:
+            return False
+        self.version += 1
+        return True
+
+    def _set_text(self, line_id, stamp, text):
+        """Take text for a line if it was written later than the current text"""
+        if stamp <= self.stamps.get(line_id, line_id):
+            return False
+        self.stamps[line_id] = stamp
+        self.lines[line_id][1] = text
+        return True
+
+    def visible_ids(self):
+        """Return the ids of the live lines in document order"""
+        if self._visible_version != self.version:
+            visible = []
+            stack = sorted(self.children.get(None, ()))
+            while stack:
+                line_id = stack.pop()
+                if not self.lines[line_id][2]:
+                    visible.append(line_id)
+                stack.extend(sorted(self.children.get(line_id, ())))
+            self._visible = visible
+            self._visible_version = self.version
+        return self._visible
+
+    def text_lines(self, ids=None):
+        """Return the text of the given (default: visible) lines"""
+        return [self.lines[line_id][1] for line_id in (self.visible_ids() if ids is None else ids)]
+
+    def diff_ops(self, base_ids, base_lines, new_lines, next_clock):
+        """Turn a local edit of the base lines into set/insert/delete operations.
+        
+        Replaced lines are paired up and keep their ids, so editing a line in
+        place leaves no tombstone behind. Returns the operations and the line
+        ids of the edited text.
+        """
+        matcher = difflib.SequenceMatcher(None, base_lines, new_lines, autojunk=False)
+        ops, ids, removed = [], [], set()
+        
+        def alive(line_id):
+            return line_id not in removed and line_id in self.lines and not self.lines[line_id][2]
+        
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                ids.extend(base_ids[i1:i2])
+                continue
+            
+            # Never anchor to a deleted line, so its tombstone can be collected
+            k = i1 - 1
+            while k >= 0 and not alive(base_ids[k]):
+                k -= 1
+            after = base_ids[k] if k >= 0 else None
+            
+            paired = min(i2 - i1, j2 - j1)
+            for line_id, text in zip(base_ids[i1:i1 + paired], new_lines[j1:j1 + paired]):
+                if alive(line_id):
+                    ops.append({'op': 'set', 'id': line_id, 'text': text,
+                                'c': next_clock(), 'd': self.device_id})
+                else:
+                    # Deleted elsewhere meanwhile, so the edit comes back as a new line
+                    line_id = (next_clock(), self.device_id)
+                    ops.append({'op': 'ins', 'id': line_id, 'after': after, 'text': text})
+                ids.append(line_id)
+                after = line_id
+            
+            for line_id in base_ids[i1 + paired:i2]:
+                ops.append({'op': 'del', 'id': line_id, 'c': next_clock(), 'd': self.device_id})
+                removed.add(line_id)
+            for text in new_lines[j1 + paired:j2]:
+                line_id = (next_clock(), self.device_id)
+                ops.append({'op': 'ins', 'id': line_id, 'after': after, 'text': text})
+                ids.append(line_id)
+                after = line_id
+        for op in ops:
+            self.apply(op)
+        return ops, ids
+
+    def collectable(self, seen):
+        """Return this device's tombstones that a compacted log can leave out.
+        
+        A tombstone can go once its whole subtree is deleted and seen(line_id)
+        says every device has read each of those deletions, so nothing can be
+        anchored below it any more. Other devices' lines in the subtree stay in
+        their own logs, unreachable and invisible.
+        """
+        order = []
+        stack = list(self.children.get(None, ()))
+        while stack:
+            line_id = stack.pop()
+            order.append(line_id)
+            stack.extend(self.children.get(line_id, ()))
+        
+        # Children before parents, so whole chains of tombstones go together
+        dead = set()
+        for line_id in reversed(order):
+            if (self.lines[line_id][2] and seen(line_id)
+                    and all(child in dead for child in self.children.get(line_id, ()))):
+                dead.add(line_id)
+        return {line_id for line_id in dead if line_id[1] == self.device_id}
+
+    def forget(self, line_ids):
+        """Drop collected tombstones from memory"""
+        for line_id in line_ids:
+            after = self.lines.pop(line_id)[0]
+            siblings = self.children.get(after)
+            if siblings is not None:  # None when the parent was dropped first
+                siblings.remove(line_id)
+                if not siblings:
+                    del self.children[after]
+            self.children.pop(line_id, None)
+            self.local_deletes.discard(line_id)
+            self.stamps.pop(line_id, None)
+            self.local_sets.discard(line_id)
+
+    def compacted_ops(self, skip=()):
+        """Return the smallest set of this device's operations giving the same state"""
+        ops = []
+        for line_id in sorted(self.lines):
+            if line_id[1] != self.device_id or line_id in skip:
+                continue
+            after, text, deleted = self.lines[line_id]
+            if deleted:
+                ops.append({'op': 'ins', 'id': line_id, 'after': after, 'text': '', 'x': 1})
+            elif line_id in self.stamps:
+                ops.append({'op': 'ins', 'id': line_id, 'after': after, 'text': text,
+                            's': self.stamps[line_id]})
+            else:
+                ops.append({'op': 'ins', 'id': line_id, 'after': after, 'text': text})
+        
+        # Only the latest text this device wrote to another device's live line matters
+        self.local_sets = {line_id for line_id in self.local_sets
+                           if line_id in self.lines and not self.lines[line_id][2]
+                           and self.stamps.get(line_id, line_id)[1] == self.device_id}
+        for line_id in sorted(self.local_sets):
+            if line_id[1] != self.device_id:
+                stamp = self.stamps[line_id]
+                ops.append({'op': 'set', 'id': line_id, 'text': self.lines[line_id][1],
+                            'c': stamp[0], 'd': self.device_id})
+        for line_id in sorted(self.local_deletes):
+            # Once the owner's log holds the deletion or dropped the line ours is redundant
+            if (line_id[1] != self.device_id and line_id not in self.owner_deletes
+                    and line_id not in skip):
+                ops.append({'op': 'del', 'id': line_id, 'c': line_id[0], 'd': self.device_id})
+        if self.local_meta is not None:
+            ops.append(self.local_meta)
+        return ops
+
+
+class NoteHistory:
+    """Version history of one note stored as delta-compressed JSON lines.
+    
+    Each record is either a keyframe holding the full text or a line delta
+    against the previous record. Reading a version only touches the nearest
+    keyframe before it and the deltas that follow.
+    """
+
+    def __init__(self, path, keyframe_every=20):
+        self.path = path
+        self.keyframe_every = keyframe_every
+        self.index = None       # [(version, timestamp, keyframe, offset, checksum)]
+        self.last_lines = None
+        self.thinned_at = 0
+
+    @staticmethod
+    def _encode(payload):
+        return base64.b64encode(zlib.compress(json.dumps(payload).encode('utf-8'))).decode('ascii')
+
+    @staticmethod
+    def _decode(data):
+        return json.loads(zlib.decompress(base64.b64decode(data)))
+
+    @staticmethod
+    def _delta(old_lines, new_lines):
+        """Encode new_lines as copied ranges of old_lines and literal text"""
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        delta = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                delta.append([i1, i2])
+            elif j2 > j1:
+                delta.append('\n'.join(new_lines[j1:j2]))
+        return delta
+
+    @staticmethod
+    def _apply_delta(old_lines, delta):
+        lines = []
+        for item in delta:
+            if isinstance(item, str):
+                lines.extend(item.split('\n'))
+            else:
+                lines.extend(old_lines[item[0]:item[1]])
+        return lines
+
+    def _load_index(self):
+        """Scan the history file once to find where each version starts"""
+        if self.index is not None:
+            return
+        self.index = []
+        if not os.path.exists(self.path):
+            return
+        
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.index.append((record['v'], record['t'], record['k'], offset, record['h']))
+                offset += len(line)
+        
+        # Drop a record torn by an interrupted write
+        if offset != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        self.thinned_at = len(self.index)
+
+    def versions(self):
+        """Return (version, timestamp) pairs, oldest first"""
+        self._load_index()
+        return [(version, timestamp) for version, timestamp, *_ in self.index]
+
+    def append(self, text, timestamp):
+        """Store text as a new version unless it matches the latest one"""
+        self._load_index()
+        checksum = zlib.crc32(text.encode('utf-8'))
+        if self.index and self.index[-1][4] == checksum:
+            return False
+        
+        lines = text.split('\n')
+        since_keyframe = 0
+        for entry in reversed(self.index):
+            if entry[2]:
+                break
+            since_keyframe += 1
+        
+        keyframe = not self.index or since_keyframe + 1 >= self.keyframe_every
+        if keyframe:
+            payload = text
+        else:
+            if self.last_lines is None:
+                self.last_lines = self.read(self.index[-1][0]).split('\n')
+            payload = self._delta(self.last_lines, lines)
+        
+        version = self.index[-1][0] + 1 if self.index else 1
+        record = {'v': version, 't': timestamp, 'k': int(keyframe), 'h': checksum,
+                  'd': self._encode(payload)}
+        
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'ab') as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(json.dumps(record).encode('utf-8') + b'\n')
+        
+        self.index.append((version, timestamp, int(keyframe), offset, checksum))
+        self.last_lines = lines
+        return True
+
+    def read(self, version):
+        """Rebuild one version from its nearest keyframe and later deltas"""
+        self._load_index()
+        versions = [entry[0] for entry in self.index]
+        position = bisect.bisect_left(versions, version)
+        if position == len(versions) or versions[position] != version:
+            raise KeyError(version)
+        
+        start = position
+        while not self.index[start][2]:
+            start -= 1
+        
+        lines = []
+        with open(self.path, 'rb') as f:
+            f.seek(self.index[start][3])
+            for _ in range(position - start + 1):
+                record = json.loads(f.readline())
+                payload = self._decode(record['d'])
+                lines = payload.split('\n') if record['k'] else self._apply_delta(lines, payload)
+        return '\n'.join(lines)
+
+    def thin(self, now, keep_days=30):
+        """Keep every version from the last hour, hourly ones for a day, then daily"""
+        self._load_index()
+        keep, buckets = set(), set()
+        for version, timestamp, *_ in reversed(self.index):
+            age = now - timestamp
+            if age < 3600:
+                keep.add(version)
+                continue
+            if age < 86400:
+                bucket = ('hour', int(timestamp // 3600))
+            elif age < keep_days * 86400:
+                bucket = ('day', int(timestamp // 86400))
+            else:
+                continue
+            if bucket not in buckets:
+                buckets.add(bucket)
+                keep.add(version)
+        if self.index:
+            keep.add(self.index[-1][0])
+        
+        self.thinned_at = len(keep)
+        if len(keep) == len(self.index):
+            return False
+        
+        # Replay the whole file once and re-encode only the kept versions
+        temp_path = self.path + '.tmp'
+        old_lines, kept_lines = [], None
+        new_index = []
+        with open(self.path, 'rb') as source, open(temp_path, 'wb') as target:
+            for version, timestamp, keyframe, offset, checksum in self.index:
+                record = json.loads(source.readline())
+                payload = self._decode(record['d'])
+                old_lines = payload.split('\n') if keyframe else self._apply_delta(old_lines, payload)
+                if version not in keep:
+                    continue
+                
+                new_keyframe = kept_lines is None or len(new_index) % self.keyframe_every == 0
+                new_payload = '\n'.join(old_lines) if new_keyframe else self._delta(kept_lines, old_lines)
+                new_record = {'v': version, 't': timestamp, 'k': int(new_keyframe), 'h': checksum,
+                              'd': self._encode(new_payload)}
+                new_index.append((version, timestamp, int(new_keyframe), target.tell(), checksum))
+                target.write(json.dumps(new_record).encode('utf-8') + b'\n')
+                kept_lines = old_lines
+        
+        os.replace(temp_path, self.path)
+        self.index = new_index
+        self.last_lines = kept_lines
+        return True
+
 
 class TransparentNotes:
     def __init__(self):
         self.root = tk.Tk()
         self.root.overrideredirect(True)
         self.settings = self.load_settings()
+        # Tk 8.6 counts characters outside the BMP (emoji) as two in text indexes
+        self.tk_wide_chars = self.root.tk.call('string', 'length', '\U0001F600') == 2
         self.minimized = False
         
         # Initialize font size and create context menu before creating tabs
         self.current_font_size = self.settings.get('font_size', 10)
         self.text_opacity = 1.0
+        self.status_visible = tk.BooleanVar(value=self.settings.get('status_bar', True))
+        self.line_numbers_visible = tk.BooleanVar(value=self.settings.get('line_numbers', False))
         self.create_context_menu()
         
         # Initialize variables before creating UI
@@ -27,8 +701,129 @@ class TransparentNotes:
         self.start_x = None
         self.start_y = None
         
+        # Widgets of closed tabs are kept here and reused by new tabs
+        self.max_pooled_tabs = 10
+        self.tab_strip_pool = []
+        self.tab_content_pool = []
+        self.tooltip = None
+        
+        # Inactive tabs are hibernated into compressed buffers past these limits
+        self.hibernate_after = self.settings.get('hibernate_after', 1800)
+        self.max_resident_tabs = self.settings.get('max_resident_tabs', 8)
+        self.memory_budget = self.settings.get('memory_budget', 16 * 1024 * 1024)
+        self.tab_budget_job = None
+        
+        # Notes are shared with other instances through per-device operation logs
+        self.sync_dir = self.settings.get('sync_dir')
+        self.device_id = self.settings.get('device_id') or uuid.uuid4().hex
+        self.sync_interval = self.settings.get('sync_interval', 2000)
+        self.sync_compact_ops = self.settings.get('sync_compact_ops', 5000)
+        self.sync_clock = 0
+        self.sync_notes = {}
+        self.sync_offsets = {}
+        self.sync_generations = {}
+        self.sync_tombstones = {}
+        self.sync_inserts = {}
+        self.sync_job = None
+        self.sync_ready = False
+        self.sync_retry_interval = 30000
+        # Operations that could not be written, closes made while the folder was
+        # unreachable and closed notes whose logs are being removed survive restarts
+        self.sync_unwritten = self.settings.get('sync_unwritten', {})
+        self.sync_closes = set(self.settings.get('sync_closes', []))
+        self.sync_closed = self.settings.get('sync_closed', {})
+        
+        # Past versions of each note, snapshotted periodically and on save
+        self.history_interval = self.settings.get('history_interval', 300)
+        self.history_keyframe_every = self.settings.get('history_keyframe_every', 20)
+        self.history_days = self.settings.get('history_days', 30)
+        self.histories = {}
+        
+        # Listeners called around every insert/delete in a text area
+        self.edit_listeners = []
+        self.edits_muted = False
+        
+        # Completions come from a prefix index of the words in every tab
+        self.autocomplete_enabled = self.settings.get('autocomplete', True)
+        self.word_index = None
+        self.complete_popup = None
+        
+        # Inserts larger than this are applied in chunks sized to chunk_target seconds
+        self.chunk_threshold = self.settings.get('chunk_threshold', 64 * 1024)
+        self.chunk_target = 0.015
+        self.chunk_size = 64 * 1024
+        self.bulk_marks = 0
+        
+        # Status bar counts are kept per text area and updated from edit deltas
+        self.status_job = None
+        self.edit_listeners.append(self._count_on_edit)
+        self.edit_listeners.append(self._gutter_on_edit)
+        
+        # Spell checking runs on a worker, visible lines first
+        self.spell_enabled = self.settings.get('spell_check', True)
+        self.spell_requests = None
+        self.spell_dictionary = None
+        self.spell_user_words = set()
+        self.spell_job = None
+        self.spell_menu_items = 0
+        self.spell_menu_target = None
+        self.suggest_requests = None
+        self.spell_suggestions = collections.OrderedDict()
+        self.suggest_pending = set()
+        
+        # Recently opened files, with their content prefetched into a bounded cache
+        self.max_recent_files = 10
+        self.recent_files = list(self.settings.get('recent_files', []))
+        self.prefetch_budget = self.settings.get('prefetch_budget', 8 * 1024 * 1024)
+        self.prefetch_cache = collections.OrderedDict()
+        self.prefetch_bytes = 0
+        self.prefetch_hits = 0
+        self.prefetch_lock = threading.Lock()
+        self.prefetch_running = False
+        
+        # Recent copies from every tab, deduplicated and capped in count and bytes
+        self.clipboard_history_size = self.settings.get('clipboard_history_size', 25)
+        self.clipboard_budget = self.settings.get('clipboard_budget', 4 * 1024 * 1024)
+        self.clipboard_compress_over = 4096
+        self.clipboard_history = collections.OrderedDict()
+        self.clipboard_bytes = 0
+        self.clipboard_popup = None
+        
+        # An opened folder is indexed in the background for the quick open finder
+        self.workspace_dir = None
+        self.workspace_hashes = self.settings.get('workspace_hashes', False)
+        self.workspace_files = []
+        self.workspace_job = None
+        self.finder_popup = None
+        self.finder_query = None
+        
+        # Tray callbacks and worker threads post work for the Tk thread here
+        self.commands = queue.Queue()
+        self.command_interval = 10
+        self.command_stats = {'count': 0, 'latency_total': 0.0, 'latency_max': 0.0, 'depth_max': 0}
+        
         # Create UI elements
         self.setup_ui()
+        self.prune_history_files()
+        
+        # Periodically hibernate tabs that have not been looked at
+        self.root.after(60000, self.check_hibernation)
+        self.root.after(self.history_interval * 1000, self.history_tick)
+        self.root.after(self.command_interval, self._drain_commands)
+        
+        if self.sync_dir:
+            self.start_sync()
+        
+        if self.spell_enabled:
+            self.start_spell_checker()
+        
+        if self.autocomplete_enabled:
+            self.start_autocomplete()
+        
+        self.prefetch_recent_files()
+        
+        if self.settings.get('workspace_dir') and os.path.isdir(self.settings['workspace_dir']):
+            self.load_workspace(self.settings['workspace_dir'])
         
         # Create system tray
         self.create_system_tray()
@@ -41,6 +836,9 @@ class TransparentNotes:
         self.root.bind('<Control-w>', lambda e: self.close_current_tab())
         self.root.bind('<Control-q>', lambda e: self.quit_app())
         self.root.bind('<Control-o>', lambda e: self.open_file())
+        self.root.bind('<Control-f>', self.show_find_replace)
+        self.root.bind('<Control-V>', self.show_clipboard_history)
+        self.root.bind('<Control-p>', self.show_quick_open)
 
     def setup_ui(self):
         """Setup all UI elements"""
@@ -70,9 +868,18 @@ class TransparentNotes:
         self.container = tk.Frame(self.main_frame, bg='black')
         self.container.pack(fill='both', expand=True)
         
+        # Create status bar
+        self.status_bar = tk.Label(self.main_frame, bg='black', fg='gray', anchor='w',
+                                   padx=10, font=('Arial', 8))
+        if self.status_visible.get():
+            self.status_bar.pack(side='bottom', fill='x', before=self.container)
+        
         # Create controls
         self.create_controls()
         
+        # Progress hint for long running inserts
+        self.progress_label = tk.Label(self.container, bg='black', fg='gray')
+        
         # Bind movement events to title bar and its children
         self.title_bar.bind('<Button-1>', self.start_move)
         self.title_bar.bind('<B1-Motion>', self.on_move)
@@ -91,8 +898,8 @@ class TransparentNotes:
         # Create resize handles
         self.create_resize_handles()
         
-        # Create first tab
-        self.create_new_tab()
+        # Reopen the saved tabs, or create a first one
+        self.restore_tabs()
         
         # Configure text area to maintain highlights
         text_area = self.tabs[self.current_tab]['text_area']
@@ -189,15 +996,25 @@ class TransparentNotes:
                                     accelerator="Ctrl+N")
         self.context_menu.add_command(label="Open File...", command=self.open_file, 
                                     accelerator="Ctrl+O")
+        self.recent_menu = tk.Menu(self.context_menu, tearoff=0, postcommand=self.build_recent_menu)
+        self.context_menu.add_cascade(label="Open Recent", menu=self.recent_menu)
+        self.context_menu.add_command(label="Open Folder...", command=self.open_folder)
+        self.context_menu.add_command(label="Quick Open...", command=self.show_quick_open,
+                                    accelerator="Ctrl+P")
         self.context_menu.add_command(label="Save As...", command=self.save_as, 
                                     accelerator="Ctrl+S")
+        self.context_menu.add_command(label="Export...", command=self.export_note)
         self.context_menu.add_separator()
         
         # Edit operations
         self.context_menu.add_command(label="Copy", command=lambda: self.text_area.event_generate('<<Copy>>'),
                                     accelerator="Ctrl+C")
-        self.context_menu.add_command(label="Paste", command=lambda: self.text_area.event_generate('<<Paste>>'),
+        self.context_menu.add_command(label="Paste", command=lambda: self.paste_clipboard(self.text_area),
                                     accelerator="Ctrl+V")
+        self.context_menu.add_command(label="Clipboard History...", command=self.show_clipboard_history,
+                                    accelerator="Ctrl+Shift+V")
+        self.context_menu.add_command(label="Find and Replace...", command=self.show_find_replace,
+                                    accelerator="Ctrl+F")
         self.context_menu.add_separator()
         
         # Underline submenu
@@ -273,6 +1090,13 @@ class TransparentNotes:
             )
         self.context_menu.add_cascade(label="Font Size", menu=font_size_menu)
         self.context_menu.add_separator()
+        self.context_menu.add_command(label="History...", command=self.show_history)
+        self.context_menu.add_command(label="Sync Folder...", command=self.set_sync_folder)
+        self.context_menu.add_checkbutton(label="Status Bar", command=self.toggle_status_bar,
+                                          variable=self.status_visible)
+        self.context_menu.add_checkbutton(label="Line Numbers", command=self.toggle_line_numbers,
+                                          variable=self.line_numbers_visible)
+        self.context_menu.add_command(label="Memory Stats...", command=self.show_memory_stats)
         self.context_menu.add_command(label="Exit", command=self.quit_app, 
                                     accelerator="Ctrl+Q")
 
@@ -372,9 +1196,7 @@ class TransparentNotes:
         """Open color picker and update text color"""
         color = colorchooser.askcolor(title="Choose Text Color")[1]
         if color:
-            for tab_info in self.tabs.values():
-                text_area = tab_info['text_area']
-                text_area.config(fg=color, insertbackground=color)
+            self.configure_text_areas(fg=color, insertbackground=color)
             self.settings['text_color'] = color
             
             # Update controls color
@@ -383,14 +1205,40 @@ class TransparentNotes:
 
     def save_settings(self):
         """Save current settings to file"""
+        # Keep the previous content of every note before it is overwritten
+        self.snapshot_tabs()
+        
         settings = {
             'opacity': self.root.attributes('-alpha'),
             'text_color': self.settings.get('text_color', 'white'),
             'font': self.settings.get('font', 'Arial'),
             'font_size': self.current_font_size,
             'geometry': self.root.geometry(),
-            'tabs': {name: {'content': tab['text_area'].get('1.0', tk.END)} 
-                    for name, tab in self.tabs.items()}
+            'hibernate_after': self.hibernate_after,
+            'max_resident_tabs': self.max_resident_tabs,
+            'memory_budget': self.memory_budget,
+            'sync_dir': self.sync_dir,
+            'device_id': self.device_id,
+            'sync_interval': self.sync_interval,
+            'sync_compact_ops': self.sync_compact_ops,
+            'sync_unwritten': self.sync_unwritten,
+            'sync_closes': sorted(self.sync_closes),
+            'sync_closed': self.sync_closed,
+            'history_interval': self.history_interval,
+            'history_keyframe_every': self.history_keyframe_every,
+            'history_days': self.history_days,
+            'spell_check': self.spell_enabled,
+            'autocomplete': self.autocomplete_enabled,
+            'chunk_threshold': self.chunk_threshold,
+            'status_bar': self.status_visible.get(),
+            'line_numbers': self.line_numbers_visible.get(),
+            'recent_files': self.recent_files,
+            'prefetch_budget': self.prefetch_budget,
+            'clipboard_history_size': self.clipboard_history_size,
+            'clipboard_budget': self.clipboard_budget,
+            'workspace_dir': self.workspace_dir,
+            'workspace_hashes': self.workspace_hashes,
+            'tabs': {name: self._saved_tab(name) for name in self.tabs}
         }
         
         try:
@@ -403,23 +1251,44 @@ class TransparentNotes:
         except Exception as e:
             print(f"Error saving settings: {e}")
 
+    def _saved_tab(self, tab_name):
+        """Settings entry for one tab, with the lines it last synced"""
+        tab = self.tabs[tab_name]
+        content = self.get_tab_content(tab_name)
+        saved = {'content': content, 'id': tab['id'], 'file_path': tab.get('file_path')}
+        if self.sync_dir and 'sync_ids' in tab:
+            saved['sync_ids'] = tab['sync_ids']
+            saved['sync_name'] = tab.get('sync_name')
+            # Usually the text is what was last synced, so it is only stored when it differs
+            if tab['sync_lines'] != content.split('\n'):
+                saved['sync_lines'] = tab['sync_lines']
+        return saved
+
     def create_tooltip(self, widget, text):
         """Create tooltip for widgets"""
-        def show_tooltip(event):
-            tooltip = tk.Toplevel()
-            tooltip.wm_overrideredirect(True)
-            tooltip.wm_geometry(f"+{event.x_root+10}+{event.y_root+10}")
-            
-            label = tk.Label(tooltip, text=text, bg='black', fg='white', relief='solid', borderwidth=1)
-            label.pack()
-            
-            def hide_tooltip():
-                tooltip.destroy()
-            
-            widget.tooltip = tooltip
-            widget.bind('<Leave>', lambda e: hide_tooltip())
-            
-        widget.bind('<Enter>', show_tooltip)
+        widget.bind('<Enter>', lambda e: self.show_tooltip(e, text))
+        widget.bind('<Leave>', lambda e: self.hide_tooltip())
+
+    def show_tooltip(self, event, text):
+        """Show the shared tooltip window next to the mouse"""
+        # A single Toplevel is reused for every tooltip instead of one per hover
+        if self.tooltip is None:
+            self.tooltip = tk.Toplevel(self.root)
+            self.tooltip.wm_overrideredirect(True)
+            self.tooltip.attributes('-topmost', True)
+            self.tooltip_label = tk.Label(self.tooltip, bg='black', fg='white',
+                                          relief='solid', borderwidth=1)
+            self.tooltip_label.pack()
+        
+        self.tooltip_label.configure(text=text)
+        self.tooltip.wm_geometry(f"+{event.x_root+10}+{event.y_root+10}")
+        self.tooltip.deiconify()
+        self.tooltip.lift()
+
+    def hide_tooltip(self):
+        """Hide the shared tooltip window"""
+        if self.tooltip is not None:
+            self.tooltip.withdraw()
 
     def set_font_style(self, font_name):
         """Set font style for current text area"""
@@ -429,8 +1298,7 @@ class TransparentNotes:
             self.settings['font'] = font_name
             
         # Update all tabs if desired
-        for tab_info in self.tabs.values():
-            tab_info['text_area'].configure(font=(font_name, self.current_font_size))
+        self.configure_text_areas(font=(font_name, self.current_font_size))
 
     def set_font_size(self, size):
         """Set specific font size"""
@@ -438,8 +1306,7 @@ class TransparentNotes:
         font_name = self.settings.get('font', 'Arial')
         
         # Update all tabs
-        for tab_info in self.tabs.values():
-            tab_info['text_area'].configure(font=(font_name, size))
+        self.configure_text_areas(font=(font_name, size))
         self.settings['font_size'] = size
 
     def increase_font_size(self, event=None):
@@ -463,6 +1330,29 @@ class TransparentNotes:
             'font': 'Arial',
             'font_size': 10,
             'geometry': '400x300+100+100',
+            'hibernate_after': 1800,
+            'max_resident_tabs': 8,
+            'memory_budget': 16 * 1024 * 1024,
+            'sync_dir': None,
+            'sync_interval': 2000,
+            'sync_compact_ops': 5000,
+            'sync_unwritten': {},
+            'sync_closes': [],
+            'sync_closed': {},
+            'history_interval': 300,
+            'history_keyframe_every': 20,
+            'history_days': 30,
+            'spell_check': True,
+            'autocomplete': True,
+            'chunk_threshold': 64 * 1024,
+            'status_bar': True,
+            'line_numbers': False,
+            'recent_files': [],
+            'prefetch_budget': 8 * 1024 * 1024,
+            'clipboard_history_size': 25,
+            'clipboard_budget': 4 * 1024 * 1024,
+            'workspace_dir': None,
+            'workspace_hashes': False,
             'tabs': {}
         }
         
@@ -498,6 +1388,27 @@ class TransparentNotes:
             if hasattr(self, 'system_tray'):
                 self.system_tray.stop()
 
+    def restore_tabs(self):
+        """Recreate the tabs saved in settings, keeping their IDs for history and sync"""
+        for tab_name, saved in self.settings.get('tabs', {}).items():
+            match = re.fullmatch(r'Note (\d+)', tab_name)
+            self.create_tab(tab_name, file_path=saved.get('file_path'),
+                            number=int(match.group(1)) if match else None,
+                            tab_id=saved.get('id'), select=False)
+            self.insert_text(self.tabs[tab_name]['text_area'], '1.0', saved.get('content', ''),
+                             undoable=False)
+            # Sync diffs the text against this to find edits made while it was not running
+            if 'sync_ids' in saved:
+                tab_info = self.tabs[tab_name]
+                tab_info['sync_ids'] = [tuple(line_id) for line_id in saved['sync_ids']]
+                tab_info['sync_lines'] = saved.get('sync_lines', saved.get('content', '').split('\n'))
+                tab_info['sync_name'] = saved.get('sync_name')
+        
+        if self.tabs:
+            self.select_tab(next(iter(self.tabs)))
+        else:
+            self.create_new_tab()
+
     def create_new_tab(self, event=None):
         """Create a new tab with incremental naming"""
         # Find the next available tab number
@@ -520,62 +1431,207 @@ class TransparentNotes:
                 next_number = len(used_numbers) + 1
         
         tab_name = f"Note {next_number}"
+        self.create_tab(tab_name, number=next_number)
+        return tab_name
+
+    def create_tab(self, tab_name, content='', file_path=None, number=None,
+                   tab_id=None, select=True):
+        """Create a tab from pooled widgets, optionally selecting it"""
+        strip = self._acquire_tab_strip(tab_name)
+        content_widgets = self._acquire_tab_content()
+        
+        # Store tab information
+        self.tabs[tab_name] = {
+            **strip,
+            **content_widgets,
+            'file_path': file_path,
+            'number': number,
+            'id': tab_id or uuid.uuid4().hex
+        }
+        if content:
+            self.insert_text(content_widgets['text_area'], '1.0', content, undoable=False)
         
-        # Create tab label with close button
-        tab_frame = tk.Frame(self.tab_frame, bg='black')
-        tab_frame.pack(side='left', padx=2)
+        # Select the new tab
+        if select:
+            self.select_tab(tab_name)
+        return tab_name
+
+    def _unique_tab_name(self, tab_name):
+        """Return tab_name, or a numbered variant if it is already taken"""
+        base_name, suffix = tab_name, 2
+        while tab_name in self.tabs:
+            tab_name = f"{base_name} ({suffix})"
+            suffix += 1
+        return tab_name
+
+    def rename_tab(self, old_name, new_name, publish=True):
+        """Rename a tab, keeping names unique; returns the name used"""
+        if new_name == old_name:
+            return old_name
+        new_name = self._unique_tab_name(new_name)
+        
+        tab_info = self.tabs.pop(old_name)
+        self.tabs[new_name] = tab_info
+        tab_info['label'].configure(text=new_name)
+        tab_info['tab_frame'].tab_name = new_name
+        if self.current_tab == old_name:
+            self.current_tab = new_name
         
-        tab_label = tk.Label(tab_frame, text=tab_name, bg='black', fg='white', 
-                            cursor='hand2', padx=5)
-        tab_label.pack(side='left')
+        if publish:
+            self._publish_sync_meta(new_name)
+        return new_name
+
+    def _acquire_tab_strip(self, tab_name):
+        """Get a tab label with close button, reusing a pooled one if possible"""
+        if self.tab_strip_pool:
+            strip = self.tab_strip_pool.pop()
+        else:
+            tab_frame = tk.Frame(self.tab_frame, bg='black')
+            
+            tab_label = tk.Label(tab_frame, bg='black', fg='white', 
+                                cursor='hand2', padx=5)
+            tab_label.pack(side='left')
+            
+            # Add close button to tab
+            close_btn = tk.Label(tab_frame, text='×', bg='black', fg='white', 
+                                cursor='hand2', padx=2)
+            close_btn.pack(side='right')
+            
+            # Bind once and look the name up on click, so reused widgets
+            # never pile up Tcl callbacks
+            tab_label.bind('<Button-1>', lambda e, f=tab_frame: self.select_tab(f.tab_name))
+            close_btn.bind('<Button-1>', lambda e, f=tab_frame: self.close_tab(f.tab_name))
+            
+            strip = {'tab_frame': tab_frame, 'label': tab_label, 'close_btn': close_btn}
         
-        # Add close button to tab
-        close_btn = tk.Label(tab_frame, text='×', bg='black', fg='white', 
-                            cursor='hand2', padx=2)
-        close_btn.pack(side='right')
-        close_btn.bind('<Button-1>', lambda e, name=tab_name: self.close_tab(name))
+        strip['tab_frame'].tab_name = tab_name
+        strip['label'].configure(text=tab_name, fg='white')
+        strip['tab_frame'].pack(side='left', padx=2)
+        return strip
+
+    def _acquire_tab_content(self):
+        """Get a content frame with text area, reusing a pooled one if possible"""
+        if self.tab_content_pool:
+            content_widgets = self.tab_content_pool.pop()
+            content_widgets['text_area'].configure(
+                font=('Arial', self.current_font_size), fg='white', insertbackground='white')
+            return content_widgets
         
         # Create content frame and text area
         content_frame = tk.Frame(self.container, bg='black')
         text_area = tk.Text(content_frame, wrap=tk.WORD, bg='black', fg='white',
                             insertbackground='white', relief='flat', padx=10, pady=5,
-                            font=('Arial', self.current_font_size))
+                            font=('Arial', self.current_font_size), undo=True)
         text_area.pack(fill='both', expand=True)
+        text_area.bind('<Button-3>', self.show_context_menu)
+        text_area.bind('<<Paste>>', lambda e: self.paste_clipboard(e.widget))
+        text_area.bind('<<Copy>>', self.record_copy)
+        text_area.bind('<<Cut>>', self.record_copy)
+        text_area.bind('<Control-V>', self.show_clipboard_history)
+        text_area.bind('<Control-p>', self.show_quick_open)
+        # Bound here so the Text class binding never moves the cursor as well
+        text_area.bind('<Control-f>', self.show_find_replace)
         
-        # Store tab information
-        self.tabs[tab_name] = {
-            'label': tab_label,
-            'frame': content_frame,
-            'text_area': text_area,
-            'tab_frame': tab_frame,
-            'close_btn': close_btn,
-            'file_path': None,
-            'number': next_number
-        }
+        # Line number gutter, redrawn on scroll, resize and line count changes
+        text_area.gutter = tk.Canvas(content_frame, width=30, bg='black', highlightthickness=0)
+        text_area.gutter.items = []
+        text_area.gutter_job = None
+        text_area.configure(yscrollcommand=lambda *args: self.schedule_gutter(text_area))
+        text_area.bind('<Configure>', lambda e: self.schedule_gutter(text_area))
         
-        # Bind events
-        tab_label.bind('<Button-1>', lambda e, name=tab_name: self.select_tab(name))
-        text_area.bind('<Button-3>', self.show_context_menu)
+        # Misspellings sit below the user's own underline and highlight tags
+        text_area.tag_configure('spell_error', underline=True, underlinefg='#FF4444')
+        text_area.tag_lower('spell_error')
+        text_area.spell_dirty = set()
+        text_area.counts = {'chars': 0, 'words': 0, 'lines': 1}
+        self._install_edit_hook(text_area)
+        text_area.bind('<KeyRelease>', self.schedule_status_update, add='+')
+        text_area.bind('<ButtonRelease-1>', self.schedule_status_update, add='+')
         
-        # Select the new tab
-        self.select_tab(tab_name)
-        return tab_name
+        # Completion popup keys; these only act while the popup is open
+        text_area.bind('<KeyRelease>', self.on_complete_key, add='+')
+        text_area.bind('<Tab>', self.accept_completion)
+        text_area.bind('<Return>', self.accept_completion)
+        text_area.bind('<Escape>', self.hide_completions)
+        text_area.bind('<Up>', lambda e: self.move_completion(-1))
+        text_area.bind('<Down>', lambda e: self.move_completion(1))
+        text_area.bind('<FocusOut>', self._completion_focus_out, add='+')
+        
+        return {'frame': content_frame, 'text_area': text_area}
+
+    def _release_tab_widgets(self, tab_info):
+        """Return a closed tab's widgets to the pools, destroying any overflow"""
+        tab_info['tab_frame'].pack_forget()
+        if len(self.tab_strip_pool) < self.max_pooled_tabs:
+            self.tab_strip_pool.append({key: tab_info[key]
+                                        for key in ('tab_frame', 'label', 'close_btn')})
+        else:
+            tab_info['tab_frame'].destroy()
+        
+        if not tab_info.get('hibernated'):
+            self._release_tab_content(tab_info)
+
+    def _release_tab_content(self, tab_info):
+        """Clear a tab's text area and pool it, destroying it if the pool is full"""
+        tab_info['frame'].pack_forget()
+        self._reset_text_area(tab_info['text_area'])
+        if len(self.tab_content_pool) < self.max_pooled_tabs:
+            self.tab_content_pool.append({'frame': tab_info['frame'],
+                                          'text_area': tab_info['text_area']})
+        else:
+            self._remove_edit_hook(tab_info['text_area'])
+            tab_info['frame'].destroy()
+
+    def _reset_text_area(self, text_area):
+        """Drop all content, formatting and undo history from a text area"""
+        job = getattr(text_area, 'bulk_insert', None)
+        if job:
+            # Inserts queued behind it go with the text they were aimed at
+            for waiting in job['queued']:
+                text_area.mark_unset(*waiting['marks'])
+            job['queued'] = []
+            self._finish_bulk_insert(text_area)
+        text_area.delete('1.0', tk.END)
+        for tag in text_area.tag_names():
+            if tag.startswith(("highlight_", "underline_")):
+                text_area.tag_delete(tag)
+        text_area.mark_set('insert', '1.0')
+        text_area.edit_reset()
+        text_area.edit_modified(False)
+        text_area.spell_dirty = set()
+        text_area.counts = {'chars': 0, 'words': 0, 'lines': 1}
+        if text_area.gutter_job is not None:
+            self.root.after_cancel(text_area.gutter_job)
+            text_area.gutter_job = None
+        text_area.gutter.pack_forget()
 
-    def close_tab(self, tab_name):
+    def close_tab(self, tab_name, publish=True):
         """Close specific tab"""
         if len(self.tabs) <= 1:  # Don't close last tab
             return
         
+        # Let other instances know the note was closed
+        if publish and self.sync_dir:
+            if self.sync_ready:
+                self._push_local_edits(tab_name)
+                self._publish_sync_meta(tab_name, closed=True)
+            else:
+                self.sync_closes.add(self.tabs[tab_name]['id'])  # published once the folder is back
+        
         # Get the tab number being closed
-        closed_num = self.tabs[tab_name]['number']
+        closed_num = self.tabs[tab_name].get('number') or 0
         
-        # Remove tab content and frame
-        self.tabs[tab_name]['frame'].destroy()
-        self.tabs[tab_name]['tab_frame'].destroy()
+        # Words of a hibernated tab never pass through a text area again
+        if self.word_index is not None and self.tabs[tab_name].get('hibernated'):
+            self._reindex_words(self.get_tab_content(tab_name), '')
+        
+        # Return tab content and label to the pools
+        self._release_tab_widgets(self.tabs[tab_name])
+        self.histories.pop(self.tabs[tab_name]['id'], None)
         
         # Select next appropriate tab before deleting
         remaining_tabs = sorted(
-            [(name, info['number']) for name, info in self.tabs.items() if name != tab_name],
+            [(name, info.get('number') or 0) for name, info in self.tabs.items() if name != tab_name],
             key=lambda x: x[1]
         )
         
@@ -590,6 +1646,8 @@ class TransparentNotes:
         
         # Delete the tab data
         del self.tabs[tab_name]
+        if self.current_tab == tab_name:
+            self.current_tab = None
         
         # Select the next tab
         if next_tab:
@@ -602,11 +1660,207 @@ class TransparentNotes:
             self.tabs[self.current_tab]['frame'].pack_forget()
             self.tabs[self.current_tab]['label'].configure(fg='white')
         
+        # Bring hibernated content back before showing it
+        if self.tabs[tab_name].get('hibernated'):
+            self.rehydrate_tab(tab_name)
+        
         # Show selected tab
         self.tabs[tab_name]['frame'].pack(fill='both', expand=True)
+        self.update_gutter(tab_name)
         self.tabs[tab_name]['label'].configure(fg='yellow')
+        self.tabs[tab_name]['last_selected'] = time.monotonic()
         self.current_tab = tab_name
         self.text_area = self.tabs[tab_name]['text_area']
+        self.schedule_tab_budget()
+        self.schedule_status_update()
+        if self.text_area.spell_dirty:
+            self.schedule_spell_check()
+
+    def get_tab_content(self, tab_name):
+        """Return a tab's text whether it is resident or hibernated"""
+        tab_info = self.tabs[tab_name]
+        if tab_info.get('hibernated'):
+            return json.loads(zlib.decompress(tab_info['hibernated']))['text']
+        return tab_info['text_area'].get('1.0', 'end-1c')
+
+    def configure_text_areas(self, **options):
+        """Apply text area options to every tab, including hibernated ones"""
+        for tab_info in self.tabs.values():
+            if tab_info.get('hibernated'):
+                tab_info['style'].update(options)
+            else:
+                tab_info['text_area'].configure(**options)
+                self.schedule_gutter(tab_info['text_area'])
+
+    def _char_offset(self, text_area, index):
+        """Convert a text index into a character offset from the start"""
+        count = text_area.count('1.0', index, 'chars')
+        return count[0] if count else 0
+
+    def hibernate_tab(self, tab_name):
+        """Compress an inactive tab's text and formatting and free its widgets"""
+        tab_info = self.tabs[tab_name]
+        if tab_name == self.current_tab or tab_info.get('hibernated'):
+            return
+        if getattr(tab_info['text_area'], 'bulk_insert', None):
+            return  # still loading
+        
+        # Unsynced edits would be lost with the widget's modified flag
+        if self.sync_dir:
+            self._push_local_edits(tab_name)
+        
+        text_area = tab_info['text_area']
+        content = text_area.get('1.0', 'end-1c')
+        
+        # Capture formatting as character offset spans
+        tags = {}
+        for tag in text_area.tag_names():
+            if not tag.startswith(("highlight_", "underline_")):
+                continue
+            ranges = text_area.tag_ranges(tag)
+            if not ranges:
+                continue
+            config = {}
+            for option in ('background', 'underline', 'underlinefg', 'font'):
+                value = str(text_area.tag_cget(tag, option))
+                if value:
+                    config[option] = value
+            tags[tag] = {
+                'config': config,
+                'ranges': [self._char_offset(text_area, index) for index in ranges]
+            }
+        
+        state = {
+            'text': content,
+            'tags': tags,
+            'insert': self._char_offset(text_area, 'insert'),
+            'yview': text_area.yview()[0]
+        }
+        tab_info['counts'] = text_area.counts
+        tab_info['style'] = {
+            'font': str(text_area.cget('font')),
+            'fg': str(text_area.cget('fg')),
+            'insertbackground': str(text_area.cget('insertbackground'))
+        }
+        tab_info['hibernated'] = zlib.compress(json.dumps(state).encode('utf-8'))
+        tab_info['hibernated_chars'] = len(content)
+        
+        # The text still exists, so edit listeners must not see it removed
+        self.edits_muted = True
+        try:
+            self._release_tab_content(tab_info)
+        finally:
+            self.edits_muted = False
+        tab_info['frame'] = None
+        tab_info['text_area'] = None
+
+    def rehydrate_tab(self, tab_name):
+        """Rebuild a hibernated tab's text area from its compressed buffer"""
+        tab_info = self.tabs[tab_name]
+        state = json.loads(zlib.decompress(tab_info.pop('hibernated')))
+        tab_info.pop('hibernated_chars', None)
+        
+        tab_info.update(self._acquire_tab_content())
+        text_area = tab_info['text_area']
+        text_area.configure(**tab_info.pop('style'))
+        self.edits_muted = True
+        try:
+            text_area.insert('1.0', state['text'])
+        finally:
+            self.edits_muted = False
+        
+        for tag, tag_state in state['tags'].items():
+            text_area.tag_configure(tag, **tag_state['config'])
+            ranges = tag_state['ranges']
+            for start, end in zip(ranges[::2], ranges[1::2]):
+                text_area.tag_add(tag, f"1.0 + {start} chars", f"1.0 + {end} chars")
+        
+        text_area.mark_set('insert', f"1.0 + {state['insert']} chars")
+        text_area.yview_moveto(state['yview'])
+        text_area.edit_reset()
+        
+        # Counts cached at hibernation are stale if find and replace changed the text
+        modified = tab_info.pop('modified_while_hibernated', False)
+        text_area.edit_modified(modified)
+        text_area.counts = None if modified else tab_info.pop('counts', None)
+        tab_info.pop('counts', None)
+        self.recheck_spelling(text_area)
+
+    def schedule_tab_budget(self):
+        """Enforce the tab memory budget once the UI is idle"""
+        if self.tab_budget_job is None:
+            self.tab_budget_job = self.root.after_idle(self.enforce_tab_budget)
+
+    def check_hibernation(self):
+        """Periodic hibernation check"""
+        self.enforce_tab_budget()
+        self.root.after(60000, self.check_hibernation)
+
+    def enforce_tab_budget(self):
+        """Hibernate least recently selected tabs that exceed the limits"""
+        self.tab_budget_job = None
+        now = time.monotonic()
+        
+        # Least recently selected first, never the visible tab
+        candidates = sorted(
+            (info.get('last_selected', 0), name) for name, info in self.tabs.items()
+            if name != self.current_tab and not info.get('hibernated')
+        )
+        
+        resident_chars = sum(self.tab_memory_usage(name) for name, info in self.tabs.items()
+                             if not info.get('hibernated'))
+        
+        for last_selected, name in candidates:
+            over_count = len(candidates) + 1 > self.max_resident_tabs
+            over_budget = resident_chars > self.memory_budget
+            idle = now - last_selected > self.hibernate_after
+            if not (over_count or over_budget or idle):
+                continue
+            resident_chars -= self.tab_memory_usage(name)
+            self.hibernate_tab(name)
+            candidates = [c for c in candidates if c[1] != name]
+
+    def tab_memory_usage(self, tab_name):
+        """Estimate resident text size of a tab in characters"""
+        tab_info = self.tabs[tab_name]
+        if tab_info.get('hibernated'):
+            return 0
+        return self._char_offset(tab_info['text_area'], 'end-1c')
+
+    def tab_memory_stats(self):
+        """Return statistics on resident and hibernated tabs"""
+        resident = [name for name, info in self.tabs.items() if not info.get('hibernated')]
+        hibernated = [info for info in self.tabs.values() if info.get('hibernated')]
+        return {
+            'resident_tabs': len(resident),
+            'hibernated_tabs': len(hibernated),
+            'resident_chars': sum(self.tab_memory_usage(name) for name in resident),
+            'hibernated_chars': sum(info['hibernated_chars'] for info in hibernated),
+            'hibernated_bytes': sum(len(info['hibernated']) for info in hibernated),
+            'memory_budget': self.memory_budget,
+            'pooled_tabs': len(self.tab_content_pool)
+        }
+
+    def show_memory_stats(self):
+        """Show tab memory statistics"""
+        stats = self.tab_memory_stats()
+        commands = self.command_stats
+        latency = commands['latency_total'] / commands['count'] if commands['count'] else 0.0
+        messagebox.showinfo(
+            "Memory Stats",
+            f"Resident tabs: {stats['resident_tabs']} ({stats['resident_chars']:,} chars)\n"
+            f"Hibernated tabs: {stats['hibernated_tabs']} ({stats['hibernated_chars']:,} chars "
+            f"in {stats['hibernated_bytes']:,} bytes)\n"
+            f"Memory budget: {stats['memory_budget']:,} chars\n"
+            f"Pooled tab widgets: {stats['pooled_tabs']}\n"
+            f"Recent file cache: {len(self.prefetch_cache)} files in {self.prefetch_bytes:,} bytes "
+            f"({self.prefetch_hits} hits)\n"
+            f"Clipboard history: {len(self.clipboard_history)} entries in {self.clipboard_bytes:,} bytes\n"
+            f"Command queue: {commands['count']:,} handled, {latency * 1000:.1f} ms average latency, "
+            f"{commands['latency_max'] * 1000:.1f} ms max, depth {self.commands.qsize()} "
+            f"(max {commands['depth_max']})",
+            parent=self.root
+        )
 
     def close_current_tab(self, event=None):
         """Close the current tab"""
@@ -614,14 +1868,7 @@ class TransparentNotes:
             return
         
         if self.current_tab:
-            # Remove tab content and label
-            self.tabs[self.current_tab]['frame'].destroy()
-            self.tabs[self.current_tab]['label'].destroy()
-            del self.tabs[self.current_tab]
-            
-            # Select another tab
-            new_tab = list(self.tabs.keys())[0]
-            self.select_tab(new_tab)
+            self.close_tab(self.current_tab)
 
     def show_context_menu(self, event):
         """Show context menu at mouse position"""
@@ -629,6 +1876,7 @@ class TransparentNotes:
             # Update text area reference before showing menu
             if event.widget.winfo_class() == 'Text':
                 self.text_area = event.widget
+                self._add_spelling_suggestions(event)
             
             self.context_menu.post(event.x_root, event.y_root)
         finally:
@@ -675,14 +1923,10 @@ class TransparentNotes:
                     f.write(content)
                 
                 # Update tab name and file path
-                file_name = os.path.basename(file_path)
-                self.tabs[self.current_tab]['label'].configure(text=file_name)
                 self.tabs[self.current_tab]['file_path'] = file_path
-                
-                # Update current tab name in tabs dictionary
-                old_tab_name = self.current_tab
-                self.tabs[file_name] = self.tabs.pop(old_tab_name)
-                self.current_tab = file_name
+                self.rename_tab(self.current_tab, os.path.basename(file_path))
+                self.update_gutter(self.current_tab)
+                self.add_recent_file(file_path)
                 
             except Exception as e:
                 print(f"Error saving file: {e}")
@@ -691,9 +1935,11 @@ class TransparentNotes:
         """Create system tray icon"""
         # Create system tray menu
         menu = (
-            pystray.MenuItem("Show", self.show_window),
-            pystray.MenuItem("Hide", self.hide_window),
-            pystray.MenuItem("Exit", self.quit_app)
+            pystray.MenuItem("Show", self._tray_command(self.show_window)),
+            pystray.MenuItem("Hide", self._tray_command(self.hide_window)),
+            pystray.MenuItem("Open Recent", pystray.Menu(self.recent_tray_items),
+                             visible=lambda item: bool(self.recent_files)),
+            pystray.MenuItem("Exit", self._tray_command(self.quit_app))
         )
         
         # Create system tray icon
@@ -719,7 +1965,14 @@ class TransparentNotes:
     def quit_app(self, event=None):
         """Safely quit the application"""
         try:
-            # Save settings before quitting
+            # Save settings before quitting, with restored or pasted text fully inserted
+            for tab_info in self.tabs.values():
+                if getattr(tab_info['text_area'], 'bulk_insert', None):
+                    self._finish_bulk_insert(tab_info['text_area'], flush=True)
+            try:
+                self.flush_sync()
+            except OSError as e:
+                print(f"Error syncing notes: {e}")
             self.save_settings()
             
             # Stop system tray icon
@@ -760,49 +2013,7 @@ class TransparentNotes:
         )
         
         if file_path:
-            try:
-                # Read file content
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Create new tab
-                tab_name = os.path.basename(file_path)
-                
-                # Create tab label
-                tab_frame = tk.Frame(self.tab_frame, bg='black')
-                tab_frame.pack(side='left', padx=2)
-                
-                tab_label = tk.Label(tab_frame, text=tab_name, bg='black', fg='white', 
-                                   cursor='hand2', padx=5)
-                tab_label.pack(side='left')
-                
-                # Create content frame and text area
-                content_frame = tk.Frame(self.container, bg='black')
-                text_area = tk.Text(content_frame, wrap=tk.WORD, bg='black', fg='white',
-                                   insertbackground='white', relief='flat', padx=10, pady=5,
-                                   font=('Arial', self.current_font_size))
-                text_area.pack(fill='both', expand=True)
-                
-                # Insert content
-                text_area.insert('1.0', content)
-                
-                # Store tab information
-                self.tabs[tab_name] = {
-                    'label': tab_label,
-                    'frame': content_frame,
-                    'text_area': text_area,
-                    'tab_frame': tab_frame,
-                    'file_path': file_path
-                }
-                
-                # Bind tab selection
-                tab_label.bind('<Button-1>', lambda e, name=tab_name: self.select_tab(name))
-                
-                # Select the new tab
-                self.select_tab(tab_name)
-                
-            except Exception as e:
-                print(f"Error opening file: {e}")
+            self.open_path(os.path.abspath(file_path))
 
     def create_resize_handles(self):
         """Create resize handles in corners only"""
@@ -976,6 +2187,2264 @@ class TransparentNotes:
                 # No text selected
                 pass
 
+    def show_find_replace(self, event=None):
+        """Show the find and replace panel"""
+        if getattr(self, 'find_panel', None) is None:
+            self.find_panel = tk.Toplevel(self.root, bg='black')
+            self.find_panel.title("Find and Replace")
+            self.find_panel.attributes('-topmost', True)
+            self.find_panel.protocol('WM_DELETE_WINDOW', self.hide_find_replace)
+            
+            form = tk.Frame(self.find_panel, bg='black')
+            form.pack(fill='x', padx=5, pady=5)
+            tk.Label(form, text="Find (regex):", bg='black', fg='white').grid(row=0, column=0, sticky='w')
+            self.find_entry = tk.Entry(form, bg='black', fg='white', insertbackground='white')
+            self.find_entry.grid(row=0, column=1, sticky='ew')
+            tk.Label(form, text="Replace:", bg='black', fg='white').grid(row=1, column=0, sticky='w')
+            self.replace_entry = tk.Entry(form, bg='black', fg='white', insertbackground='white')
+            self.replace_entry.grid(row=1, column=1, sticky='ew')
+            form.columnconfigure(1, weight=1)
+            
+            self.find_ignore_case = tk.BooleanVar(value=False)
+            tk.Checkbutton(form, text="Ignore case", variable=self.find_ignore_case,
+                           bg='black', fg='white', selectcolor='black',
+                           activebackground='black').grid(row=2, column=1, sticky='w')
+            
+            buttons = tk.Frame(self.find_panel, bg='black')
+            buttons.pack(fill='x', padx=5)
+            tk.Button(buttons, text="Find All", command=lambda: self.start_search(replace=False)).pack(side='left')
+            tk.Button(buttons, text="Replace All", command=lambda: self.start_search(replace=True)).pack(side='left', padx=5)
+            tk.Button(buttons, text="Cancel", command=self.cancel_search).pack(side='left')
+            
+            self.find_status = tk.Label(self.find_panel, bg='black', fg='gray', anchor='w')
+            self.find_status.pack(fill='x', padx=5)
+            
+            self.find_results = tk.Listbox(self.find_panel, bg='black', fg='white',
+                                           width=70, height=12, activestyle='none')
+            self.find_results.pack(fill='both', expand=True, padx=5, pady=5)
+            self.find_results.bind('<Double-Button-1>', self.goto_search_result)
+            self.find_entry.bind('<Return>', lambda e: self.start_search(replace=False))
+            
+            self.search_job = None
+            self.search_matches = []
+        
+        self.find_panel.deiconify()
+        self.find_panel.lift()
+        self.find_entry.focus_set()
+        return 'break'
+
+    def hide_find_replace(self):
+        """Cancel any running search and hide the panel"""
+        self.cancel_search()
+        self.find_panel.withdraw()
+
+    def start_search(self, replace=False):
+        """Search every tab on a worker thread, optionally replacing matches"""
+        self.cancel_search()
+        
+        # Compile once on the Tk thread so bad patterns are reported immediately
+        flags = re.MULTILINE | (re.IGNORECASE if self.find_ignore_case.get() else 0)
+        try:
+            pattern = re.compile(self.find_entry.get(), flags)
+        except re.error as e:
+            self.find_status.configure(text=f"Invalid pattern: {e}")
+            return
+        if not pattern.pattern:
+            return
+        replacement = self.replace_entry.get() if replace else None
+        
+        # Resident tabs are read here; hibernated tabs are decompressed by the worker
+        sources = []
+        for name, info in self.tabs.items():
+            if info.get('hibernated'):
+                sources.append((name, None, info['hibernated']))
+            else:
+                sources.append((name, info['text_area'].get('1.0', 'end-1c'), None))
+        
+        self.find_results.delete(0, tk.END)
+        self.search_matches = []
+        self.search_job = {
+            'cancel': threading.Event(),
+            'edits': [],
+            'replace': replace,
+            'modified': 0,
+            'skipped': 0
+        }
+        thread = threading.Thread(target=self._search_worker,
+                                  args=(self.search_job, pattern, replacement, sources))
+        thread.daemon = True
+        thread.start()
+        
+        self.find_status.configure(text="Searching...")
+
+    def _search_worker(self, job, pattern, replacement, sources):
+        """Scan tab contents for matches and stage replacements (worker thread)"""
+        batch_size = 200
+        
+        for tab_name, content, blob in sources:
+            if job['cancel'].is_set():
+                return
+            state = None
+            if blob is not None:
+                state = json.loads(zlib.decompress(blob))
+                content = state['text']
+            
+            batch = []
+            edits = []
+            line_no, line_start, scanned = 1, 0, 0
+            for match in pattern.finditer(content):
+                if job['cancel'].is_set():
+                    return
+                start, end = match.span()
+                
+                # Track line numbers incrementally instead of rescanning
+                newlines = content.count('\n', scanned, start)
+                if newlines:
+                    line_no += newlines
+                    line_start = content.rfind('\n', scanned, start) + 1
+                scanned = start
+                line_end = content.find('\n', start)
+                preview = content[line_start:line_end if line_end != -1 else len(content)]
+                
+                # Columns are counted the way Tk counts them, not in Python characters
+                end_line = line_no + content.count('\n', start, end)
+                end_start = content.rfind('\n', 0, end) + 1
+                position = (f"{line_no}.{self._tk_len(content[line_start:start])}",
+                            f"{end_line}.{self._tk_len(content[end_start:end])}")
+                batch.append((tab_name, position, f"{tab_name}:{line_no}: {preview.strip()[:80]}"))
+                
+                if replacement is not None:
+                    edits.append((start, end, position, match.expand(replacement)))
+                if len(batch) >= batch_size:
+                    self.post_command(self._add_search_results, job, batch)
+                    batch = []
+            
+            if batch:
+                self.post_command(self._add_search_results, job, batch)
+            if edits:
+                new_blob = None
+                if state is not None:
+                    new_blob = self._replace_in_state(state, edits)
+                job['edits'].append((tab_name, zlib.crc32(content.encode('utf-8')),
+                                     blob, new_blob, edits))
+        
+        self.post_command(self._finish_search, job)
+
+    def _tk_len(self, text):
+        """Length of text in the characters Tk counts for indexes"""
+        if self.tk_wide_chars and not text.isascii():
+            return len(text.encode('utf-16-le')) // 2
+        return len(text)
+
+    def _replace_in_state(self, state, edits):
+        """Apply replacements to a hibernated tab state and recompress it"""
+        text = state['text']
+        pieces, previous = [], 0
+        # Tag ranges and the cursor are stored in Tk counts, so spans are mapped in them too
+        spans, starts, shifts, delta, tk_previous = [], [], [], 0, 0
+        for start, end, position, new_text in edits:
+            pieces.append(text[previous:start])
+            pieces.append(new_text)
+            tk_start = tk_previous + self._tk_len(text[previous:start])
+            tk_previous = tk_start + self._tk_len(text[start:end])
+            previous = end
+            spans.append((tk_start, tk_previous, self._tk_len(new_text)))
+            starts.append(tk_start)
+            shifts.append(delta)
+            delta += spans[-1][2] - (tk_previous - tk_start)
+        pieces.append(text[previous:])
+        
+        def map_offset(offset):
+            i = bisect.bisect_right(starts, offset) - 1
+            if i < 0:
+                return offset
+            start, end, new_length = spans[i]
+            if offset >= end:
+                return offset + shifts[i] + new_length - (end - start)
+            return start + shifts[i] + min(offset - start, new_length)
+        
+        state['text'] = ''.join(pieces)
+        for tag_state in state['tags'].values():
+            tag_state['ranges'] = [map_offset(offset) for offset in tag_state['ranges']]
+        state['insert'] = map_offset(state['insert'])
+        return zlib.compress(json.dumps(state).encode('utf-8'))
+
+    def _add_search_results(self, job, batch):
+        """Stream a batch of worker results into the panel"""
+        if job is not self.search_job:
+            return
+        for tab_name, position, label in batch:
+            self.search_matches.append((tab_name, position))
+            self.find_results.insert(tk.END, label)
+
+    def _finish_search(self, job):
+        """Apply staged replacements once the worker has finished scanning"""
+        if job is not self.search_job:
+            return
+        
+        if job['replace'] and job['edits']:
+            # One tab per tick so a cancel never interrupts a tab midway
+            self._apply_tab_replacements(*job['edits'].pop(0), job=job)
+            self.find_status.configure(text=f"Replacing... {job['modified']} tabs done")
+            self.root.after(1, self._finish_search, job)
+            return
+        
+        summary = f"{len(self.search_matches)} matches"
+        if job['replace']:
+            summary += f", {job['modified']} tabs modified"
+            if job['skipped']:
+                summary += f", {job['skipped']} changed tabs skipped"
+        self.find_status.configure(text=summary)
+        self.search_job = None
+
+    def _apply_tab_replacements(self, tab_name, checksum, blob, new_blob, edits, job):
+        """Apply all staged replacements to one tab as a single edit"""
+        tab_info = self.tabs.get(tab_name)
+        
+        # Skip tabs that were closed or edited since they were scanned
+        if tab_info is None or zlib.crc32(self.get_tab_content(tab_name).encode('utf-8')) != checksum:
+            job['skipped'] += 1
+            return
+        
+        if tab_info.get('hibernated'):
+            # Re-stage against the current buffer if the tab was re-hibernated
+            if tab_info['hibernated'] is not blob or new_blob is None:
+                new_blob = self._replace_in_state(
+                    json.loads(zlib.decompress(tab_info['hibernated'])), edits)
+            if self.word_index is not None:
+                self._reindex_words(self.get_tab_content(tab_name),
+                                    json.loads(zlib.decompress(new_blob))['text'])
+            tab_info['hibernated'] = new_blob
+            tab_info['hibernated_chars'] = len(json.loads(zlib.decompress(new_blob))['text'])
+            tab_info['modified_while_hibernated'] = True
+        else:
+            text_area = tab_info['text_area']
+            text_area.edit_separator()
+            text_area.configure(autoseparators=False)
+            for start, end, (start_index, end_index), new_text in reversed(edits):
+                text_area.delete(start_index, end_index)
+                text_area.insert(start_index, new_text)
+            self._end_edit_group(text_area)
+        job['modified'] += 1
+
+    def cancel_search(self):
+        """Stop the running search; tabs already replaced stay fully replaced"""
+        job = getattr(self, 'search_job', None)
+        if job is not None:
+            job['cancel'].set()
+            self.search_job = None
+            self.find_status.configure(
+                text=f"Cancelled after {len(self.search_matches)} matches, "
+                     f"{job['modified']} tabs modified")
+
+    def goto_search_result(self, event=None):
+        """Select the tab and text of the chosen search result"""
+        selection = self.find_results.curselection()
+        if not selection:
+            return
+        tab_name, (start_index, end_index) = self.search_matches[selection[0]]
+        if tab_name not in self.tabs:
+            return
+        
+        self.select_tab(tab_name)
+        text_area = self.tabs[tab_name]['text_area']
+        text_area.tag_remove('sel', '1.0', tk.END)
+        text_area.tag_add('sel', start_index, end_index)
+        text_area.mark_set('insert', start_index)
+        text_area.see(start_index)
+
+
+    def set_sync_folder(self):
+        """Choose the shared folder used to sync notes between instances"""
+        folder = filedialog.askdirectory(title="Choose Sync Folder")
+        if not folder:
+            return
+        if self.sync_dir and os.path.normcase(os.path.abspath(folder)) == \
+                os.path.normcase(os.path.abspath(self.sync_dir)):
+            return  # already syncing there
+        
+        # Edits not yet written belong to the folder being left
+        try:
+            self.flush_sync()
+        except OSError as e:
+            print(f"Error syncing notes: {e}")
+        self.sync_unwritten = {}
+        self.sync_closes = set()
+        self.sync_closed = {}
+        for tab_info in self.tabs.values():
+            for key in ('sync_ids', 'sync_lines', 'sync_name'):
+                tab_info.pop(key, None)
+        self.sync_dir = folder
+        self.settings['sync_dir'] = folder
+        self.start_sync()
+
+    def start_sync(self):
+        """Load every note log from the sync folder and start merging"""
+        if self.sync_job:
+            self.root.after_cancel(self.sync_job)
+            self.sync_job = None
+        
+        self.sync_ready = False
+        self.sync_notes = {}
+        self.sync_offsets = {}
+        self.sync_generations = {}
+        self.sync_tombstones = {}
+        self.sync_inserts = {}
+        
+        # Read every log, this device's included, before publishing anything so
+        # existing notes continue their logs instead of being published again
+        try:
+            os.makedirs(self.sync_dir, exist_ok=True)
+            self.sync_closed = {tab_id: done for tab_id, done in self.sync_closed.items()
+                                if os.path.isdir(os.path.join(self.sync_dir, tab_id))}
+            self._read_sync_logs()
+            for tab_id, ops in list(self.sync_unwritten.items()):
+                note = self.sync_notes.setdefault(tab_id, SyncedNote(self.device_id))
+                for op in ops:
+                    self.sync_clock = max(self.sync_clock, self._sync_op_clock(op))
+                    note.apply(op)
+                self._append_sync_ops(tab_id, [])
+        except OSError as e:
+            print(f"Error opening sync folder: {e}")
+            # Try again later, e.g. once a network drive is reachable
+            self.sync_job = self.root.after(self.sync_retry_interval, self.start_sync)
+            return
+        self.sync_ready = True
+        
+        for tab_id in self.sync_closes:
+            note = self.sync_notes.get(tab_id)
+            if note is not None and note.meta is not None and not note.meta[3]:
+                op = {'op': 'meta', 'c': self._next_sync_clock(), 'd': self.device_id,
+                      'name': note.meta[2], 'closed': True}
+                note.apply(op)
+                try:
+                    self._append_sync_ops(tab_id, [op])
+                except OSError as e:
+                    print(f"Error syncing notes: {e}")
+        self.sync_closes = set()
+        
+        # Every tab is diffed against the lines it last synced on the next tick, so
+        # edits made while sync was not running are published, not overwritten
+        for tab_name, tab_info in list(self.tabs.items()):
+            note = self.sync_notes.get(tab_info['id'])
+            synced_ids = tab_info.get('sync_ids')
+            if note is None:
+                for key in ('sync_ids', 'sync_lines', 'sync_name'):
+                    tab_info.pop(key, None)
+            elif synced_ids is None or any(line_id not in note.lines for line_id in synced_ids):
+                # No record of the last sync, e.g. for a folder used before: keep the local text
+                tab_info['sync_ids'] = list(note.visible_ids())
+                tab_info['sync_lines'] = note.text_lines(tab_info['sync_ids'])
+            if note is not None and tab_info.get('sync_name') not in (None, tab_name):
+                self._publish_sync_meta(tab_name)  # renamed while sync was not running
+            tab_info.pop('sync_version', None)
+            tab_info['sync_pending'] = True
+        self.sync_tick()
+
+    def sync_tick(self):
+        """Publish local edits, then merge new operations from other devices"""
+        self.sync_job = None
+        try:
+            self.flush_sync()
+            self._read_sync_logs()
+            self._apply_synced_notes()
+        except OSError as e:
+            print(f"Error syncing notes: {e}")
+        self.sync_job = self.root.after(self.sync_interval, self.sync_tick)
+
+    def flush_sync(self):
+        """Write pending local edits of all tabs to the log"""
+        if self.sync_dir and self.sync_ready:
+            for tab_name in list(self.tabs):
+                self._push_local_edits(tab_name)
+            for tab_id in list(self.sync_unwritten):
+                self._append_sync_ops(tab_id, [])
+
+    def _next_sync_clock(self):
+        """Advance the logical clock for a new operation"""
+        self.sync_clock += 1
+        return self.sync_clock
+
+    def _push_local_edits(self, tab_name):
+        """Diff a tab against its synced state and log the changed lines"""
+        tab_info = self.tabs[tab_name]
+        if not self.sync_ready:
+            return  # diffed against the lines it last synced once the folder is read
+        if tab_info.get('hibernated'):
+            # Tabs are pushed before they hibernate, so only a sync start leaves one pending
+            if not tab_info.pop('sync_pending', False):
+                return
+            lines = self.get_tab_content(tab_name).split('\n')
+        else:
+            text_area = tab_info['text_area']
+            if getattr(text_area, 'bulk_insert', None):
+                return  # still loading, pushed once the text is complete
+            pending = tab_info.pop('sync_pending', False)
+            if not text_area.edit_modified() and not pending:
+                return
+            text_area.edit_modified(False)
+            lines = text_area.get('1.0', 'end-1c').split('\n')
+        
+        ops = []
+        note = self.sync_notes.get(tab_info['id'])
+        if note is None:
+            # Empty notes are not published until they get content
+            if lines == ['']:
+                return
+            note = self.sync_notes[tab_info['id']] = SyncedNote(self.device_id)
+            ops.append(self._sync_meta_op(tab_name))
+            note.apply(ops[0])
+            tab_info['sync_name'] = tab_name
+        
+        # Diff against what the tab last synced, not the merged note, so remote
+        # changes that are not shown yet are never taken as local deletions
+        new_ops, tab_info['sync_ids'] = note.diff_ops(
+            tab_info.get('sync_ids', []), tab_info.get('sync_lines', []),
+            lines, self._next_sync_clock)
+        ops.extend(new_ops)
+        tab_info['sync_lines'] = lines
+        try:
+            self._append_sync_ops(tab_info['id'], ops)
+        except OSError as e:
+            print(f"Error syncing notes: {e}")
+
+    def _sync_meta_op(self, tab_name, closed=False):
+        """Build a name/closed metadata operation"""
+        return {'op': 'meta', 'c': self._next_sync_clock(), 'd': self.device_id,
+                'name': tab_name, 'closed': closed}
+
+    def _publish_sync_meta(self, tab_name, closed=False):
+        """Log a rename or close of a published note"""
+        tab_info = self.tabs[tab_name]
+        note = self.sync_notes.get(tab_info['id']) if self.sync_dir and self.sync_ready else None
+        if note is None:
+            return
+        op = self._sync_meta_op(tab_name, closed)
+        note.apply(op)
+        tab_info['sync_name'] = tab_name
+        try:
+            self._append_sync_ops(tab_info['id'], [op])
+        except OSError as e:
+            print(f"Error syncing notes: {e}")
+
+    def _sync_log_path(self, tab_id, device_id, generation):
+        """Path of one device's log for a note"""
+        return os.path.join(self.sync_dir, tab_id, f"{device_id}.{generation}.log")
+
+    def _append_sync_ops(self, tab_id, ops):
+        """Append operations to this device's log for a note.
+        
+        Operations that cannot be written are kept and go first next time;
+        applying one twice changes nothing, so a partly written batch is safe.
+        """
+        ops = self.sync_unwritten.pop(tab_id, []) + ops
+        if not ops:
+            return
+        generation, count, base = self.sync_generations.get(tab_id, (0, 0, 0))
+        try:
+            os.makedirs(os.path.join(self.sync_dir, tab_id), exist_ok=True)
+            with open(self._sync_log_path(tab_id, self.device_id, generation), 'ab') as f:
+                for op in ops:
+                    f.write(json.dumps(op, separators=(',', ':')).encode('utf-8') + b'\n')
+                    self._track_tombstone(tab_id, op, self.device_id, generation, f.tell())
+        except OSError:
+            self.sync_unwritten[tab_id] = ops
+            raise
+        
+        count += len(ops)
+        self.sync_generations[tab_id] = (generation, count, base)
+        if count > max(self.sync_compact_ops, 2 * base):
+            self._compact_sync_log(tab_id)
+
+    def _sync_op_clock(self, op):
+        """Highest logical clock value an operation carries"""
+        clock = op['id'][0] if op.get('op') == 'ins' else op.get('c', 0)
+        return max(clock, op['s'][0]) if op.get('s') else clock
+
+    def _track_tombstone(self, tab_id, op, device_id, generation, offset):
+        """Remember where a line's deletion ends in a device's log"""
+        if op.get('op') == 'del' or (op.get('op') == 'ins' and op.get('x')):
+            positions = self.sync_tombstones.setdefault(tab_id, {}).setdefault(tuple(op['id']), {})
+            positions[(device_id, generation)] = offset
+
+    def _tombstones_seen(self, tab_id):
+        """Return a test for whether every other device has read a tombstone's deletion"""
+        note_dir = os.path.join(self.sync_dir, tab_id)
+        devices = set()
+        for entry in os.scandir(note_dir):
+            parts = entry.name.split('.')
+            if len(parts) == 3 and parts[2] == 'log' and parts[0] != self.device_id:
+                devices.add(parts[0])
+        
+        acks = {}
+        for device_id in devices:
+            try:
+                with open(os.path.join(note_dir, f"{device_id}.acks"), 'r', encoding='utf-8') as f:
+                    ack = json.load(f)
+            except (OSError, ValueError):
+                return lambda line_id: False
+            
+            # Lines that device anchored before acknowledging must have been read here
+            read_position = self.sync_offsets.get((tab_id, device_id), (-1, 0))
+            if read_position < tuple(ack['log']):
+                return lambda line_id: False
+            acks[device_id] = ack['seen']
+        
+        tombstones = self.sync_tombstones.get(tab_id, {})
+        
+        def has_read(device_id, positions):
+            for (log_device, generation), offset in positions.items():
+                if log_device == device_id:
+                    return True  # the device wrote the deletion itself
+                read = acks[device_id].get(log_device)
+                if read and read[0] == generation and read[1] >= offset:
+                    return True
+            return False
+        
+        def seen(line_id):
+            positions = tombstones.get(line_id, {})
+            return all(has_read(device_id, positions) for device_id in acks)
+        return seen
+
+    def _write_sync_acks(self, tab_id):
+        """Record how far this device has read the other logs of a note"""
+        note_dir = os.path.join(self.sync_dir, tab_id)
+        generation = self.sync_generations.get(tab_id, (0, 0, 0))[0]
+        log_path = self._sync_log_path(tab_id, self.device_id, generation)
+        ack = {
+            'log': [generation, os.path.getsize(log_path) if os.path.exists(log_path) else 0],
+            'seen': {device_id: list(position) for (note_id, device_id), position
+                     in self.sync_offsets.items() if note_id == tab_id and device_id != self.device_id}
+        }
+        self._store_sync_acks(note_dir, ack)
+
+    def _store_sync_acks(self, note_dir, ack):
+        """Replace this device's acknowledgements for a note in one step"""
+        temp_path = os.path.join(note_dir, f"{self.device_id}.acks.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(ack, f)
+        os.replace(temp_path, os.path.join(note_dir, f"{self.device_id}.acks"))
+
+    def _compact_sync_log(self, tab_id):
+        """Rewrite this device's log as the minimal operations for the current state.
+        
+        Lines edited in place keep their id, so only the latest text of each
+        line is kept. Tombstones are dropped once every device has read the
+        deletion; one that a surviving line is anchored after has to stay, so
+        only deleting lines above later ones leaves markers behind.
+        """
+        generation, count, base = self.sync_generations[tab_id]
+        note = self.sync_notes[tab_id]
+        seen = self._tombstones_seen(tab_id)
+        collected = note.collectable(seen)
+        
+        # Deletions of other devices' lines that their owner's current log no longer holds
+        inserted = self.sync_inserts.get(tab_id, {})
+        collected |= {line_id for line_id in note.local_deletes
+                      if line_id[1] != self.device_id and seen(line_id)
+                      and self.sync_offsets.get((tab_id, line_id[1]), (-1, 0))[0]
+                      > inserted.get(line_id, -1)}
+        ops = note.compacted_ops(skip=collected)
+        
+        # Other instances see the new generation and re-read it from the start
+        temp_path = os.path.join(self.sync_dir, tab_id, f"{self.device_id}.tmp")
+        with open(temp_path, 'wb') as f:
+            for op in ops:
+                f.write(json.dumps(op, separators=(',', ':')).encode('utf-8') + b'\n')
+                self._track_tombstone(tab_id, op, self.device_id, generation + 1, f.tell())
+        os.replace(temp_path, self._sync_log_path(tab_id, self.device_id, generation + 1))
+        
+        note.forget(line_id for line_id in collected if line_id[1] == self.device_id)
+        note.local_deletes -= collected
+        tombstones = self.sync_tombstones.get(tab_id, {})
+        for line_id in collected:
+            tombstones.pop(line_id, None)
+        try:
+            os.remove(self._sync_log_path(tab_id, self.device_id, generation))
+        except OSError:
+            pass
+        
+        self.sync_generations[tab_id] = (generation + 1, len(ops), len(ops))
+
+    def _latest_sync_logs(self, note_dir):
+        """Map each device to its newest log of a note, the only current one"""
+        latest = {}
+        for entry in os.scandir(note_dir):
+            parts = entry.name.split('.')
+            if len(parts) != 3 or parts[2] != 'log' or not parts[1].isdigit():
+                continue
+            generation = int(parts[1])
+            if parts[0] not in latest or generation > latest[parts[0]][0]:
+                latest[parts[0]] = (generation, entry)
+        return latest
+
+    def _drop_closed_note(self, tab_id):
+        """Forget a closed note so its logs are no longer read every tick"""
+        if self.sync_unwritten.get(tab_id):
+            return  # the close itself is not written yet
+        for state in (self.sync_notes, self.sync_generations, self.sync_tombstones, self.sync_inserts):
+            state.pop(tab_id, None)
+        self.sync_offsets = {key: position for key, position in self.sync_offsets.items()
+                             if key[0] != tab_id}
+        self.sync_closed[tab_id] = self._remove_closed_note_files(tab_id)
+
+    def _remove_closed_note_files(self, tab_id):
+        """Delete this device's log of a closed note once every device has read it.
+        
+        Returns True when nothing of this device is left in the note's folder.
+        """
+        note_dir = os.path.join(self.sync_dir, tab_id)
+        try:
+            latest = self._latest_sync_logs(note_dir)
+            own = latest.pop(self.device_id, None)
+            if own:
+                # The rest of a closed note is not needed, so the other logs count as read
+                own_position = [own[0], own[1].stat().st_size]
+                self._store_sync_acks(note_dir, {
+                    'log': own_position,
+                    'seen': {device_id: [generation, entry.stat().st_size]
+                             for device_id, (generation, entry) in latest.items()}
+                })
+                devices = set(latest)
+                devices.update(name[:-len('.acks')] for name in os.listdir(note_dir)
+                               if name.endswith('.acks'))
+                devices.discard(self.device_id)
+                for device_id in devices:
+                    try:
+                        with open(os.path.join(note_dir, f"{device_id}.acks"), 'r', encoding='utf-8') as f:
+                            seen = json.load(f)['seen'].get(self.device_id)
+                    except (OSError, ValueError, KeyError):
+                        return False
+                    if not seen or seen < own_position:
+                        return False
+            
+            for name in os.listdir(note_dir):
+                if name.split('.')[0] == self.device_id:
+                    os.remove(os.path.join(note_dir, name))
+            if not os.listdir(note_dir):
+                os.rmdir(note_dir)
+        except OSError:
+            return False
+        return True
+
+    def _read_sync_logs(self):
+        """Apply operations appended to other devices' logs since the last read"""
+        for tab_entry in os.scandir(self.sync_dir):
+            if not tab_entry.is_dir():
+                continue
+            tab_id = tab_entry.name
+            read_remote = False
+            
+            # Closed notes are not read again, only their own logs cleaned up
+            if tab_id in self.sync_closed:
+                if not self.sync_closed[tab_id]:
+                    self.sync_closed[tab_id] = self._remove_closed_note_files(tab_id)
+                continue
+            
+            for device_id, (generation, entry) in self._latest_sync_logs(tab_entry.path).items():
+                own_log = device_id == self.device_id
+                if own_log and tab_id in self.sync_generations:
+                    continue  # our own operations are applied as they are written
+                
+                known_generation, offset = self.sync_offsets.get((tab_id, device_id), (None, 0))
+                if generation != known_generation:
+                    offset = 0
+                if entry.stat().st_size <= offset:
+                    continue
+                
+                with open(entry.path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+                # Leave a partially written last line for the next read
+                consumed = data.rfind(b'\n') + 1
+                self.sync_offsets[(tab_id, device_id)] = (generation, offset + consumed)
+                
+                note = self.sync_notes.get(tab_id)
+                if note is None:
+                    note = self.sync_notes[tab_id] = SyncedNote(self.device_id)
+                count = 0
+                position = offset
+                for line in data[:consumed].splitlines(keepends=True):
+                    position += len(line)
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.sync_clock = max(self.sync_clock, self._sync_op_clock(op))
+                    note.apply(op)
+                    count += 1
+                    self._track_tombstone(tab_id, op, device_id, generation, position)
+                    if op.get('op') == 'ins':
+                        self.sync_inserts.setdefault(tab_id, {})[tuple(op['id'])] = generation
+                
+                if own_log:
+                    self.sync_generations[tab_id] = (generation, count, count)
+                else:
+                    read_remote = True
+            
+            # Tell the other devices which of their tombstones may be collected
+            if read_remote:
+                self._write_sync_acks(tab_id)
+
+    def _apply_synced_notes(self):
+        """Bring local tabs in line with the merged notes"""
+        tab_ids = {info['id']: name for name, info in self.tabs.items()}
+        
+        for tab_id, note in list(self.sync_notes.items()):
+            if note.meta is None:
+                continue  # wait until the note's metadata has been read
+            _, _, name, closed = note.meta
+            tab_name = tab_ids.get(tab_id)
+            
+            if tab_name is None:
+                if not closed:
+                    tab_name = self.create_tab(self._unique_tab_name(name),
+                                               content='\n'.join(note.text_lines()),
+                                               tab_id=tab_id, select=False)
+                    tab_info = self.tabs[tab_name]
+                    tab_info['text_area'].edit_modified(False)
+                    tab_info['sync_ids'] = list(note.visible_ids())
+                    tab_info['sync_lines'] = note.text_lines()
+                    tab_info['sync_version'] = note.version
+                    tab_info['sync_name'] = name
+                else:
+                    self._drop_closed_note(tab_id)
+                continue
+            
+            if closed:
+                self.close_tab(tab_name, publish=False)
+                if tab_name not in self.tabs:
+                    self._drop_closed_note(tab_id)
+                continue
+            
+            tab_info = self.tabs[tab_name]
+            if tab_info.get('sync_name') != name:
+                tab_info['sync_name'] = name
+                tab_name = self.rename_tab(tab_name, name, publish=False)
+            
+            if tab_info.get('hibernated') or tab_info.get('sync_version') == note.version:
+                continue
+            if getattr(tab_info['text_area'], 'bulk_insert', None):
+                continue  # patched once its text is fully inserted
+            self._patch_synced_lines(tab_info, note)
+
+    def _patch_synced_lines(self, tab_info, note):
+        """Replace only the lines of a tab that changed remotely"""
+        text_area = tab_info['text_area']
+        old_ids = tab_info.get('sync_ids', [])
+        new_ids = list(note.visible_ids())
+        total = len(old_ids)
+        
+        if not old_ids:
+            text_area.delete('1.0', 'end-1c')
+            text_area.insert('1.0', '\n'.join(note.text_lines(new_ids)))
+        else:
+            # Lines edited in place keep their id, so compare the text as well
+            matcher = difflib.SequenceMatcher(None, list(zip(old_ids, tab_info.get('sync_lines', []))),
+                                              list(zip(new_ids, note.text_lines(new_ids))),
+                                              autojunk=False)
+            for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+                if tag == 'equal':
+                    continue
+                new_text = '\n'.join(note.text_lines(new_ids[j1:j2]))
+                if i1 == 0 and i2 == total:
+                    text_area.delete('1.0', 'end-1c')
+                    text_area.insert('1.0', new_text)
+                elif i2 < total:
+                    text_area.delete(f"{i1 + 1}.0", f"{i2 + 1}.0")
+                    if j2 > j1:
+                        text_area.insert(f"{i1 + 1}.0", new_text + '\n')
+                else:
+                    # Replacing through the last line also takes the newline before it
+                    text_area.delete(f"{i1}.end", 'end-1c')
+                    if j2 > j1:
+                        text_area.insert(f"{i1}.end", '\n' + new_text)
+        
+        text_area.edit_modified(False)
+        tab_info['sync_ids'] = new_ids
+        tab_info['sync_lines'] = note.text_lines(new_ids)
+        tab_info['sync_version'] = note.version
+
+
+    def _history_for(self, tab_id):
+        """Get the version history of a note"""
+        if tab_id not in self.histories:
+            path = os.path.join(os.getenv('APPDATA'), 'TransparentNotes', 'history', f"{tab_id}.log")
+            self.histories[tab_id] = NoteHistory(path, self.history_keyframe_every)
+        return self.histories[tab_id]
+
+    def prune_history_files(self):
+        """Delete histories of notes that are no longer open and were not touched for history_days"""
+        history_dir = os.path.join(os.getenv('APPDATA'), 'TransparentNotes', 'history')
+        open_ids = {tab_info['id'] for tab_info in self.tabs.values()}
+        cutoff = time.time() - self.history_days * 86400
+        try:
+            with os.scandir(history_dir) as entries:
+                for entry in entries:
+                    tab_id, ext = os.path.splitext(entry.name)
+                    if ext == '.log' and tab_id not in open_ids and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except OSError as e:
+            if os.path.isdir(history_dir):
+                print(f"Error pruning note history: {e}")
+
+    def snapshot_tabs(self):
+        """Record a new version of every tab whose content changed"""
+        now = time.time()
+        for tab_name, tab_info in list(self.tabs.items()):
+            if getattr(tab_info['text_area'], 'bulk_insert', None):
+                continue  # still loading
+            try:
+                content = self.get_tab_content(tab_name)
+                history = self._history_for(tab_info['id'])
+                if not content.strip() and not history.versions():
+                    continue
+                
+                # Thin old versions once enough new ones have piled up
+                if history.append(content, now) and len(history.index) - history.thinned_at >= 50:
+                    history.thin(now, self.history_days)
+            except Exception as e:
+                print(f"Error saving note history: {e}")
+
+    def history_tick(self):
+        """Periodic version snapshot"""
+        self.snapshot_tabs()
+        self.root.after(self.history_interval * 1000, self.history_tick)
+
+    def show_history(self):
+        """Show the version timeline of the current tab"""
+        if not self.current_tab:
+            return
+        self.snapshot_tabs()
+        
+        if getattr(self, 'history_panel', None) is None:
+            self.history_panel = tk.Toplevel(self.root, bg='black')
+            self.history_panel.attributes('-topmost', True)
+            self.history_panel.protocol('WM_DELETE_WINDOW', self.history_panel.withdraw)
+            
+            self.history_list = tk.Listbox(self.history_panel, bg='black', fg='white',
+                                           width=24, activestyle='none', exportselection=False)
+            self.history_list.pack(side='left', fill='y', padx=5, pady=5)
+            self.history_list.bind('<<ListboxSelect>>', self.preview_history_version)
+            
+            right = tk.Frame(self.history_panel, bg='black')
+            right.pack(side='left', fill='both', expand=True, padx=5, pady=5)
+            self.history_preview = tk.Text(right, wrap=tk.WORD, bg='black', fg='white',
+                                           relief='flat', width=60, height=20, state='disabled')
+            self.history_preview.pack(fill='both', expand=True)
+            tk.Button(right, text="Restore This Version",
+                      command=self.restore_history_version).pack(anchor='e', pady=(5, 0))
+        
+        self.history_tab_id = self.tabs[self.current_tab]['id']
+        self.history_versions = list(reversed(self._history_for(self.history_tab_id).versions()))
+        self.history_list.delete(0, tk.END)
+        for version, timestamp in self.history_versions:
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
+            self.history_list.insert(tk.END, f"{stamp}  v{version}")
+        
+        self.history_panel.title(f"History - {self.current_tab}")
+        self.history_panel.deiconify()
+        self.history_panel.lift()
+
+    def preview_history_version(self, event=None):
+        """Show the selected past version"""
+        selection = self.history_list.curselection()
+        if not selection:
+            return
+        version = self.history_versions[selection[0]][0]
+        try:
+            content = self._history_for(self.history_tab_id).read(version)
+        except Exception as e:
+            print(f"Error reading note history: {e}")
+            return
+        
+        self.history_preview.configure(state='normal')
+        self.history_preview.delete('1.0', tk.END)
+        self.history_preview.insert('1.0', content)
+        self.history_preview.configure(state='disabled')
+
+    def restore_history_version(self):
+        """Replace the note's content with the previewed version"""
+        tab_name = next((name for name, info in self.tabs.items()
+                         if info['id'] == self.history_tab_id), None)
+        if tab_name is None:
+            return
+        
+        self.select_tab(tab_name)
+        text_area = self.tabs[tab_name]['text_area']
+        self.insert_text(text_area, '1.0', self.history_preview.get('1.0', 'end-1c'),
+                         replace=('1.0', 'end-1c'))
+
+
+    def _install_edit_hook(self, text_area):
+        """Route a text area's insert/delete calls through the edit listeners"""
+        widget = str(text_area._w)
+        original = widget + '_orig'
+        self.root.tk.call('rename', widget, original)
+        
+        def proxy(command, *args):
+            if command in ('insert', 'delete', 'replace') and self.edit_listeners and not self.edits_muted:
+                return self._hooked_edit(text_area, original, command, args)
+            return self.root.tk.call(original, command, *args)
+        
+        self.root.tk.createcommand(widget, proxy)
+        text_area.edit_hook = original
+
+    def _remove_edit_hook(self, text_area):
+        """Restore a text area's own widget command before it is destroyed"""
+        widget = str(text_area._w)
+        self.root.tk.deletecommand(widget)
+        self.root.tk.call('rename', text_area.edit_hook, widget)
+
+    def _hooked_edit(self, text_area, original, command, args):
+        """Run one insert/delete/replace, telling listeners what changes"""
+        call = self.root.tk.call
+        
+        if command == 'replace':
+            start = str(call(original, 'index', args[0]))
+            self._hooked_edit(text_area, original, 'delete', args[:2])
+            return self._hooked_edit(text_area, original, 'insert', (start,) + args[2:])
+        
+        if command == 'insert':
+            edit = {'op': 'insert', 'start': str(call(original, 'index', args[0])),
+                    'text': ''.join(args[1::2])}
+        else:
+            if len(args) > 2:
+                # Several ranges: delete them one at a time, last first
+                ranges = sorted(zip(args[::2], args[1::2]),
+                                key=lambda r: [int(n) for n in str(call(original, 'index', r[0])).split('.')])
+                for first, last in reversed(ranges):
+                    self._hooked_edit(text_area, original, 'delete', (first, last))
+                return ''
+            start = str(call(original, 'index', args[0]))
+            end = str(call(original, 'index', args[1] if len(args) > 1 else f"{start}+1c"))
+            if call(original, 'compare', end, '>', 'end-1c'):
+                end = str(call(original, 'index', 'end-1c'))
+            if not call(original, 'compare', start, '<', end):
+                return ''
+            edit = {'op': 'delete', 'start': start, 'end': end,
+                    'text': str(call(original, 'get', start, end))}
+        
+        self._notify_edit(text_area, 'before', edit)
+        result = call(original, command, *args)
+        self._notify_edit(text_area, 'after', edit)
+        return result
+
+    def _notify_edit(self, text_area, phase, edit):
+        """Pass an edit to every listener without letting one break the edit"""
+        for listener in self.edit_listeners:
+            try:
+                listener(text_area, phase, edit)
+            except Exception as e:
+                print(f"Error in edit listener: {e}")
+
+    def start_spell_checker(self):
+        """Start the background spell check worker"""
+        self.spell_requests = queue.Queue()
+        # Newest first, so a right-click jumps ahead of precomputed words
+        self.suggest_requests = queue.LifoQueue()
+        self.spell_dictionary = None
+        self.edit_listeners.append(self._spell_on_edit)
+        
+        for worker in (self._spell_worker, self._suggest_worker):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+        
+        # Tabs restored at startup were filled before the listener existed
+        for tab_info in self.tabs.values():
+            if not tab_info.get('hibernated'):
+                self.recheck_spelling(tab_info['text_area'])
+
+    def _spell_data_path(self, file_name):
+        return os.path.join(os.getenv('APPDATA'), 'TransparentNotes', file_name)
+
+    def _load_spell_dictionary(self):
+        """Find a word list and map a sorted copy of it (worker thread)"""
+        candidates = [
+            self.settings.get('spell_words'),
+            self._spell_data_path('words.txt'),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'words.txt'),
+            '/usr/share/dict/words'
+        ]
+        source = next((path for path in candidates if path and os.path.exists(path)), None)
+        if source is None:
+            print("Spell check disabled: no word list found, put one word per line in "
+                  f"{self._spell_data_path('words.txt')}")
+            return None
+        
+        # Sort once into a cache file that later starts can map directly. The
+        # cache is keyed on the source, so switching to another list (even an
+        # older one) rebuilds it
+        sorted_path = self._spell_data_path('spell_words.sorted')
+        stat = os.stat(source)
+        key = {'source': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        try:
+            with open(sorted_path + '.json', 'r', encoding='utf-8') as f:
+                cached_key = json.load(f)
+        except (OSError, ValueError):
+            cached_key = None
+        if cached_key != key or not os.path.exists(sorted_path):
+            with open(source, 'r', encoding='utf-8', errors='ignore') as f:
+                words = {line.strip().lower().encode('utf-8') for line in f if line.strip()}
+            os.makedirs(os.path.dirname(sorted_path), exist_ok=True)
+            with open(sorted_path + '.tmp', 'wb') as f:
+                f.write(b'\n'.join(sorted(words)) + b'\n')
+            os.replace(sorted_path + '.tmp', sorted_path)
+            with open(sorted_path + '.json', 'w', encoding='utf-8') as f:
+                json.dump(key, f)
+        
+        user_path = self._spell_data_path('user_words.txt')
+        if os.path.exists(user_path):
+            with open(user_path, 'r', encoding='utf-8') as f:
+                self.spell_user_words.update(line.strip().lower() for line in f if line.strip())
+        
+        return SpellDictionary(sorted_path)
+
+    def _spell_worker(self):
+        """Check lines for misspelled words (worker thread)"""
+        try:
+            self.spell_dictionary = self._load_spell_dictionary()
+        except Exception as e:
+            print(f"Error loading spell dictionary: {e}")
+        if self.spell_dictionary is None:
+            self.spell_requests = None
+            return
+        
+        requests = self.spell_requests
+        while True:
+            text_area, line, text = requests.get()
+            spans = [match.span() for match in SPELL_WORD_RE.finditer(text)
+                     if self._is_misspelled(match.group())]
+            self.post_command(self._mark_spelling, text_area, line, text, spans)
+
+    def _is_misspelled(self, word):
+        """Check one word, skipping acronyms and mixed-case identifiers"""
+        word = word.strip("'")
+        if len(word) < 2 or any(c.isupper() for c in word[1:]):
+            return False
+        lower = word.lower()
+        return lower not in self.spell_user_words and word not in self.spell_dictionary
+
+    def _spell_on_edit(self, text_area, phase, edit):
+        """Mark the lines touched by an edit for re-checking"""
+        if phase != 'after':
+            return
+        line = int(edit['start'].split('.')[0])
+        newlines = edit['text'].count('\n')
+        
+        # Keep pending line numbers pointing at the same text
+        dirty = text_area.spell_dirty
+        if newlines:
+            if edit['op'] == 'insert':
+                dirty = {n + newlines if n > line else n for n in dirty}
+            else:
+                dirty = {n - newlines if n > line else n for n in dirty
+                         if not line < n <= line + newlines}
+        dirty.update(range(line, line + newlines + 1) if edit['op'] == 'insert' else (line,))
+        text_area.spell_dirty = dirty
+        self.schedule_spell_check()
+
+    def schedule_spell_check(self, delay=300):
+        """Coalesce spell check requests from a burst of edits"""
+        if self.spell_requests is None:
+            return
+        if self.spell_job is None:
+            self.spell_job = self.root.after(delay, self.run_spell_check)
+
+    def run_spell_check(self):
+        """Queue dirty lines of the current tab, visible ones first"""
+        self.spell_job = None
+        if not self.current_tab:
+            return
+        text_area = self.tabs[self.current_tab]['text_area']
+        if not text_area.spell_dirty:
+            return
+        
+        first = int(text_area.index('@0,0').split('.')[0])
+        last = int(text_area.index(f"@0,{text_area.winfo_height()}").split('.')[0])
+        visible = [n for n in text_area.spell_dirty if first <= n <= last]
+        self._queue_spell_lines(text_area, visible)
+        
+        # Everything else is checked in small batches while idle
+        if text_area.spell_dirty:
+            self.spell_job = self.root.after(10, self._spell_idle_batch, text_area)
+
+    def _spell_idle_batch(self, text_area, batch_size=200):
+        """Queue the next batch of off-screen dirty lines"""
+        self.spell_job = None
+        if not self.current_tab or self.tabs[self.current_tab]['text_area'] is not text_area:
+            return
+        batch = sorted(text_area.spell_dirty)[:batch_size]
+        self._queue_spell_lines(text_area, batch)
+        if text_area.spell_dirty:
+            self.spell_job = self.root.after(10, self._spell_idle_batch, text_area)
+
+    def _queue_spell_lines(self, text_area, lines):
+        requests = self.spell_requests
+        if requests is None:
+            return
+        last_line = int(text_area.index('end-1c').split('.')[0])
+        for line in lines:
+            text_area.spell_dirty.discard(line)
+            if line <= last_line:
+                requests.put((text_area, line, text_area.get(f"{line}.0", f"{line}.end")))
+
+    def _mark_spelling(self, text_area, line, text, spans):
+        """Mark misspellings the worker found on one line"""
+        # Lines edited since they were queued are checked again later
+        try:
+            if text_area.get(f"{line}.0", f"{line}.end") != text:
+                return
+        except tk.TclError:
+            return  # the text area was destroyed
+        text_area.tag_remove('spell_error', f"{line}.0", f"{line}.end")
+        for start, end in spans:
+            text_area.tag_add('spell_error', f"{line}.{start}", f"{line}.{end}")
+        
+        # Get suggestions ready for misspellings the user can see
+        if spans and text_area is self.text_area and text_area.dlineinfo(f"{line}.0"):
+            for start, end in spans:
+                self._request_suggestions(text[start:end].strip("'"))
+
+    def _suggest_worker(self):
+        """Compute spelling suggestions off the Tk thread (worker thread)"""
+        requests = self.suggest_requests
+        while True:
+            word = requests.get()
+            # The dictionary is loaded by the spell worker
+            while self.spell_dictionary is None:
+                if self.spell_requests is None:
+                    return
+                time.sleep(0.1)
+            try:
+                suggestions = self.spell_dictionary.suggest(word)
+            except Exception as e:
+                print(f"Error finding spelling suggestions: {e}")
+                suggestions = []
+            self.post_command(self._store_suggestions, word, suggestions)
+
+    def _request_suggestions(self, word):
+        """Queue a word for the suggestion worker unless it is cached or queued"""
+        if word in self.spell_suggestions or word in self.suggest_pending or self.suggest_requests is None:
+            return
+        self.suggest_pending.add(word)
+        self.suggest_requests.put(word)
+
+    def _store_suggestions(self, word, suggestions):
+        """Cache suggestions from the worker and fill an open context menu"""
+        self.suggest_pending.discard(word)
+        self.spell_suggestions[word] = suggestions
+        self.spell_suggestions.move_to_end(word)
+        while len(self.spell_suggestions) > 256:
+            self.spell_suggestions.popitem(last=False)
+        
+        target = self.spell_menu_target
+        if target and target[3].strip("'") == word:
+            self._build_spelling_menu(*target)
+
+    def recheck_spelling(self, text_area):
+        """Queue every line of a text area for spell checking"""
+        if self.spell_requests is None:
+            return
+        last_line = int(text_area.index('end-1c').split('.')[0])
+        text_area.spell_dirty = set(range(1, last_line + 1))
+        self.schedule_spell_check()
+
+    def _add_spelling_suggestions(self, event):
+        """Put suggestions for a misspelled word at the top of the context menu"""
+        self.spell_menu_target = None
+        self._clear_spelling_menu()
+        
+        text_area = event.widget
+        index = text_area.index(f"@{event.x},{event.y}")
+        if self.spell_dictionary is None or 'spell_error' not in text_area.tag_names(index):
+            return
+        
+        line, column = map(int, index.split('.'))
+        line_text = text_area.get(f"{line}.0", f"{line}.end")
+        match = next((m for m in SPELL_WORD_RE.finditer(line_text)
+                      if m.start() <= column <= m.end()), None)
+        if match is None:
+            return
+        word = match.group()
+        start, end = f"{line}.{match.start()}", f"{line}.{match.end()}"
+        
+        # Searching a large word list can take a few hundred ms, so the worker does it
+        self._request_suggestions(word.strip("'"))
+        self.spell_menu_target = (text_area, start, end, word)
+        self._build_spelling_menu(*self.spell_menu_target)
+
+    def _clear_spelling_menu(self):
+        if self.spell_menu_items:
+            self.context_menu.delete(0, self.spell_menu_items - 1)
+            self.spell_menu_items = 0
+
+    def _build_spelling_menu(self, text_area, start, end, word):
+        """Show cached suggestions, or a placeholder until the worker posts them"""
+        self._clear_spelling_menu()
+        suggestions = self.spell_suggestions.get(word.strip("'"))
+        
+        entries = 0
+        for suggestion in suggestions or ():
+            self.context_menu.insert_command(
+                entries, label=suggestion,
+                command=lambda s=suggestion: self.replace_word(text_area, start, end, s))
+            entries += 1
+        if not entries:
+            label = "(Finding suggestions...)" if suggestions is None else "(No suggestions)"
+            self.context_menu.insert_command(entries, label=label, state='disabled')
+            entries += 1
+        self.context_menu.insert_command(entries, label=f'Add "{word}" to Dictionary',
+                                         command=lambda: self.add_to_dictionary(word))
+        self.context_menu.insert_separator(entries + 1)
+        self.spell_menu_items = entries + 2
+
+    def replace_word(self, text_area, start, end, word):
+        """Replace a misspelled word with a suggestion"""
+        self.insert_text(text_area, start, word, replace=(start, end))
+
+    def add_to_dictionary(self, word):
+        """Accept a word in every tab and remember it"""
+        word = word.strip("'").lower()
+        self.spell_user_words.add(word)
+        try:
+            user_path = self._spell_data_path('user_words.txt')
+            os.makedirs(os.path.dirname(user_path), exist_ok=True)
+            with open(user_path, 'a', encoding='utf-8') as f:
+                f.write(word + '\n')
+        except Exception as e:
+            print(f"Error saving user dictionary: {e}")
+        
+        for tab_info in self.tabs.values():
+            if not tab_info.get('hibernated'):
+                self.recheck_spelling(tab_info['text_area'])
+
+
+    def start_autocomplete(self):
+        """Index the words of every tab and keep the index updated from edits"""
+        self.word_index = PrefixIndex()
+        for tab_name in self.tabs:
+            self._reindex_words('', self.get_tab_content(tab_name))
+        self.edit_listeners.append(self._index_on_edit)
+
+    def _reindex_words(self, old_text, new_text):
+        """Apply the word count difference between two texts to the index"""
+        old_words = collections.Counter(AUTOCOMPLETE_WORD_RE.findall(old_text))
+        new_words = collections.Counter(AUTOCOMPLETE_WORD_RE.findall(new_text))
+        for word, count in (old_words - new_words).items():
+            self.word_index.remove(word, count)
+        for word, count in (new_words - old_words).items():
+            self.word_index.add(word, count)
+
+    def _index_on_edit(self, text_area, phase, edit):
+        """Re-count the words on the lines an edit touches"""
+        start_line = edit['start'].split('.')[0]
+        if phase == 'before':
+            end = edit['end'] if edit['op'] == 'delete' else edit['start']
+            edit['index_old_text'] = text_area.get(f"{start_line}.0", f"{end} lineend")
+        else:
+            lines_after = edit['text'].count('\n') if edit['op'] == 'insert' else 0
+            new_text = text_area.get(f"{start_line}.0", f"{start_line}.0 + {lines_after} lines lineend")
+            self._reindex_words(edit.pop('index_old_text'), new_text)
+
+    def _complete_prefix(self, text_area):
+        """Return the partial word before the cursor, if completion applies"""
+        match = re.search(r"[^\W\d]\w*$", text_area.get('insert linestart', 'insert'))
+        if match is None or len(match.group()) < 2:
+            return None
+        if re.match(r"\w", text_area.get('insert')):
+            return None
+        return match.group()
+
+    def on_complete_key(self, event):
+        """Show completions for the word being typed"""
+        if self.word_index is None or event.keysym in ('Up', 'Down', 'Return', 'Tab', 'Escape'):
+            return
+        text_area = event.widget
+        prefix = self._complete_prefix(text_area)
+        words = [word for word in self.word_index.complete(prefix) if word != prefix] if prefix else []
+        if not words:
+            self.hide_completions()
+            return
+        
+        if self.complete_popup is None:
+            self.complete_popup = tk.Toplevel(self.root)
+            self.complete_popup.wm_overrideredirect(True)
+            self.complete_popup.attributes('-topmost', True)
+            self.complete_list = tk.Listbox(self.complete_popup, bg='black', fg='white',
+                                            selectbackground='gray', activestyle='none',
+                                            height=8, exportselection=False)
+            self.complete_list.pack()
+            self.complete_list.bind('<ButtonRelease-1>', lambda e: self.accept_completion())
+        
+        self.complete_list.delete(0, tk.END)
+        for word in words:
+            self.complete_list.insert(tk.END, word)
+        self.complete_list.configure(height=len(words))
+        self.complete_list.selection_set(0)
+        
+        bbox = text_area.bbox('insert')
+        if bbox:
+            x = text_area.winfo_rootx() + bbox[0]
+            y = text_area.winfo_rooty() + bbox[1] + bbox[3]
+            self.complete_popup.wm_geometry(f"+{x}+{y}")
+        self.complete_target = (text_area, prefix)
+        self.complete_popup.deiconify()
+        self.complete_popup.lift()
+
+    def hide_completions(self, event=None):
+        """Hide the completion popup; returns 'break' if it was open"""
+        if self.complete_popup is not None and self.complete_popup.winfo_ismapped():
+            self.complete_popup.withdraw()
+            return 'break'
+
+    def _completion_focus_out(self, event):
+        """Hide the popup once focus has left, unless it went to the popup itself"""
+        # Deferred so a click on the list is handled before the popup is hidden
+        self.root.after_idle(self._hide_completions_unless_used)
+
+    def _hide_completions_unless_used(self):
+        if self.complete_popup is None:
+            return
+        # Widget paths as strings, since Tk's own popdowns have no tkinter widget
+        popup = str(self.complete_popup)
+        focus = str(self.root.tk.call('focus'))
+        pointed = str(self.root.tk.call('winfo', 'containing', *self.root.winfo_pointerxy()))
+        if any(path == popup or path.startswith(popup + '.') for path in (focus, pointed)):
+            return
+        self.hide_completions()
+
+    def move_completion(self, step):
+        """Move the completion selection, consuming the key if the popup is open"""
+        if self.complete_popup is None or not self.complete_popup.winfo_ismapped():
+            return None
+        selection = self.complete_list.curselection()
+        position = max(0, min(self.complete_list.size() - 1, (selection[0] if selection else 0) + step))
+        self.complete_list.selection_clear(0, tk.END)
+        self.complete_list.selection_set(position)
+        self.complete_list.see(position)
+        return 'break'
+
+    def accept_completion(self, event=None):
+        """Insert the rest of the selected word"""
+        if self.complete_popup is None or not self.complete_popup.winfo_ismapped():
+            return None
+        selection = self.complete_list.curselection()
+        text_area, prefix = self.complete_target
+        if selection and self._complete_prefix(text_area) == prefix:
+            text_area.insert('insert', self.complete_list.get(selection[0])[len(prefix):])
+        self.complete_popup.withdraw()
+        text_area.focus_set()  # after a click on the list
+        return 'break'
+
+
+    def paste_clipboard(self, text_area):
+        """Paste the clipboard through the chunked insert pipeline"""
+        try:
+            text = text_area.clipboard_get()
+        except tk.TclError:
+            return 'break'  # nothing to paste
+        
+        self.record_clipboard(text)
+        replace = ('sel.first', 'sel.last') if text_area.tag_ranges('sel') else None
+        self.insert_text(text_area, 'insert', text, replace=replace)
+        text_area.see('insert')
+        return 'break'
+
+    def insert_text(self, text_area, index, text, replace=None, undoable=True):
+        """Insert text as one undo step, spreading large inserts over several ticks.
+        
+        replace is an optional (start, end) range deleted in the same step.
+        """
+        # Only one bulk insert runs per text area; later inserts wait behind it
+        job = getattr(text_area, 'bulk_insert', None)
+        if job:
+            # Marks keep the target pointing at the same text while chunks go in
+            marks = [self._bulk_mark(text_area, index, 'right')]
+            if replace:
+                marks += [self._bulk_mark(text_area, replace[0], 'right'),
+                          self._bulk_mark(text_area, replace[1], 'left')]
+            job['queued'].append({'text': text, 'marks': marks, 'undoable': undoable})
+            return
+        
+        text_area.edit_separator()
+        text_area.configure(autoseparators=False, undo=undoable)
+        if replace:
+            index = text_area.index(replace[0])
+            text_area.delete(*replace)
+        
+        if len(text) <= self.chunk_threshold:
+            text_area.insert(index, text)
+            self._end_edit_group(text_area, undoable)
+            return
+        
+        # Right gravity keeps the mark after each chunk inserted at it
+        text_area.bulk_insert = {'text': text, 'position': 0, 'undoable': undoable, 'queued': [],
+                                 'mark': self._bulk_mark(text_area, index, 'right')}
+        self.root.after(1, self._insert_next_chunk, text_area, text_area.bulk_insert)
+
+    def _bulk_mark(self, text_area, index, gravity):
+        self.bulk_marks += 1
+        mark = f"bulk_insert_{self.bulk_marks}"
+        text_area.mark_set(mark, index)
+        text_area.mark_gravity(mark, gravity)
+        return mark
+
+    def _insert_next_chunk(self, text_area, job):
+        """Insert one line-aligned chunk and size the next one by its cost"""
+        if getattr(text_area, 'bulk_insert', None) is not job:
+            return  # cancelled or finished
+        
+        text, position = job['text'], job['position']
+        end = min(len(text), position + self.chunk_size)
+        if end < len(text):
+            newline = text.rfind('\n', position, end)
+            if newline != -1:
+                end = newline + 1
+        
+        started = time.perf_counter()
+        text_area.insert(job['mark'], text[position:end])
+        elapsed = time.perf_counter() - started
+        job['position'] = end
+        
+        # Aim each chunk at the target tick time
+        per_char = elapsed / max(1, end - position)
+        if per_char > 0:
+            self.chunk_size = int(max(4096, min(1024 * 1024, self.chunk_target / per_char)))
+        
+        if end < len(text):
+            self.show_progress(f"Inserting... {end * 100 // len(text)}%")
+            self.root.after(1, self._insert_next_chunk, text_area, job)
+        else:
+            self._finish_bulk_insert(text_area)
+
+    def _finish_bulk_insert(self, text_area, flush=False):
+        """Close a bulk insert and start the inserts queued behind it.
+        
+        flush inserts what is left of it, and of every queued insert, in one go.
+        """
+        job = text_area.bulk_insert
+        text_area.bulk_insert = None
+        if flush:
+            text_area.insert(job['mark'], job['text'][job['position']:])
+        text_area.mark_unset(job['mark'])
+        self._end_edit_group(text_area, job['undoable'])
+        self.show_progress(None)
+        
+        queued = job['queued']
+        while queued:
+            waiting = queued.pop(0)
+            marks = waiting['marks']
+            index = text_area.index(marks[0])
+            replace = (text_area.index(marks[1]), text_area.index(marks[2])) if len(marks) > 1 else None
+            text_area.mark_unset(*marks)
+            self.insert_text(text_area, index, waiting['text'], replace, waiting['undoable'])
+            if text_area.bulk_insert:
+                text_area.bulk_insert['queued'] = queued
+                if flush:
+                    self._finish_bulk_insert(text_area, flush=True)
+                return
+
+    def _end_edit_group(self, text_area, undoable=True):
+        text_area.edit_separator()
+        if not undoable:
+            text_area.edit_reset()
+        text_area.configure(autoseparators=True, undo=True)
+
+    def show_progress(self, message):
+        """Show or hide (with None) a small progress hint"""
+        if message is None:
+            self.progress_label.place_forget()
+        else:
+            self.progress_label.configure(text=message)
+            self.progress_label.place(relx=1, rely=1, anchor='se', x=-8, y=-4)
+            self.progress_label.lift()
+
+
+    def _count_on_edit(self, text_area, phase, edit):
+        """Update a text area's cached counts from the inserted or removed text"""
+        if text_area.counts is None:
+            return
+        if phase == 'before':
+            # Only the characters next to the edit decide if words merge or split
+            start = edit['start']
+            edit['count_left'] = text_area.get(f"{start}-1c") if start != '1.0' else ''
+            edit['count_right'] = text_area.get(edit['end'] if edit['op'] == 'delete' else start)
+            return
+        
+        left, right, text = edit.pop('count_left'), edit.pop('count_right'), edit['text']
+        words = len((left + text + right).split()) - len((left + right).split())
+        sign = 1 if edit['op'] == 'insert' else -1
+        counts = text_area.counts
+        counts['chars'] += sign * len(text)
+        counts['lines'] += sign * text.count('\n')
+        counts['words'] += sign * words
+        self.schedule_status_update()
+
+    def _full_counts(self, text_area):
+        """Count everything once, for text areas without cached counts"""
+        text = text_area.get('1.0', 'end-1c')
+        return {'chars': len(text), 'words': len(text.split()), 'lines': text.count('\n') + 1}
+
+    def schedule_status_update(self, event=None):
+        """Refresh the status bar once the current burst of events is handled"""
+        if self.status_job is None:
+            self.status_job = self.root.after_idle(self.update_status_bar)
+
+    def update_status_bar(self):
+        """Show cursor position and counts of the current tab"""
+        self.status_job = None
+        if not self.current_tab or not self.status_visible.get():
+            return
+        text_area = self.tabs[self.current_tab]['text_area']
+        if text_area.counts is None:
+            text_area.counts = self._full_counts(text_area)
+        counts = text_area.counts
+        line, column = text_area.index('insert').split('.')
+        self.status_bar.configure(
+            text=f"Ln {line}, Col {int(column) + 1}    {counts['words']:,} words    "
+                 f"{counts['lines']:,} lines    {counts['chars']:,} chars")
+
+    def toggle_status_bar(self):
+        """Show or hide the status bar"""
+        self.settings['status_bar'] = self.status_visible.get()
+        if self.status_visible.get():
+            self.status_bar.pack(side='bottom', fill='x', before=self.container)
+            self.schedule_status_update()
+        else:
+            self.status_bar.pack_forget()
+
+
+    def update_gutter(self, tab_name):
+        """Show the line number gutter for file tabs or when enabled for all tabs"""
+        tab_info = self.tabs[tab_name]
+        text_area = tab_info['text_area']
+        if self.line_numbers_visible.get() or tab_info.get('file_path'):
+            if not text_area.gutter.winfo_manager():
+                text_area.gutter.pack(side='left', fill='y', before=text_area)
+            self.schedule_gutter(text_area)
+        else:
+            text_area.gutter.pack_forget()
+
+    def toggle_line_numbers(self):
+        """Turn line numbers on or off for note tabs"""
+        self.settings['line_numbers'] = self.line_numbers_visible.get()
+        if self.current_tab:
+            self.update_gutter(self.current_tab)
+
+    def schedule_gutter(self, text_area, *args):
+        """Redraw a gutter at most once per frame"""
+        if text_area.gutter_job is None and text_area.gutter.winfo_manager():
+            text_area.gutter_job = self.root.after(16, self.redraw_gutter, text_area)
+
+    def _gutter_on_edit(self, text_area, phase, edit):
+        """Line count changes move the numbers even if the view did not scroll"""
+        if phase == 'after' and '\n' in edit['text']:
+            self.schedule_gutter(text_area)
+
+    def redraw_gutter(self, text_area):
+        """Number only the lines currently on screen, reusing canvas items"""
+        text_area.gutter_job = None
+        gutter = text_area.gutter
+        font = text_area.cget('font')
+        last_line = int(text_area.index('end-1c').split('.')[0])
+        width = int(self.root.tk.call('font', 'measure', font, str(last_line))) + 12
+        if int(gutter.cget('width')) != width:
+            gutter.configure(width=width)
+        
+        line = int(text_area.index('@0,0').split('.')[0])
+        used = 0
+        while line <= last_line:
+            info = text_area.dlineinfo(f"{line}.0")
+            if info is None:
+                if used:
+                    break  # below the visible area
+                line += 1  # first visible row continues a wrapped line
+                continue
+            
+            if used < len(gutter.items):
+                item = gutter.items[used]
+                gutter.coords(item, width - 6, info[1])
+                gutter.itemconfigure(item, text=str(line), font=font, state='normal')
+            else:
+                gutter.items.append(gutter.create_text(width - 6, info[1], anchor='ne', text=str(line),
+                                                       fill='gray', font=font))
+            used += 1
+            line += 1
+        
+        for item in gutter.items[used:]:
+            gutter.itemconfigure(item, state='hidden')
+
+
+    def open_path(self, file_path):
+        """Open a file into a new tab, or select the tab already showing it"""
+        try:
+            # Create new tab, keeping names unique
+            tab_name = os.path.basename(file_path)
+            if tab_name in self.tabs:
+                if self.tabs[tab_name].get('file_path') == file_path:
+                    self.select_tab(tab_name)
+                    self.add_recent_file(file_path)
+                    return
+                tab_name = self._unique_tab_name(tab_name)
+            
+            content = self.read_recent_file(file_path)
+            self.create_tab(tab_name, file_path=file_path)
+            self.insert_text(self.tabs[tab_name]['text_area'], '1.0', content, undoable=False)
+            self.add_recent_file(file_path)
+            
+        except Exception as e:
+            print(f"Error opening file: {e}")
+            if not os.path.exists(file_path):
+                self.remove_recent_file(file_path)
+
+    def add_recent_file(self, file_path):
+        """Move a path to the front of the recent files list"""
+        file_path = os.path.abspath(file_path)
+        if file_path in self.recent_files:
+            self.recent_files.remove(file_path)
+        self.recent_files.insert(0, file_path)
+        del self.recent_files[self.max_recent_files:]
+        self.update_tray_menu()
+
+    def remove_recent_file(self, file_path):
+        """Forget a recent file and its cached content"""
+        file_path = os.path.abspath(file_path)
+        if file_path in self.recent_files:
+            self.recent_files.remove(file_path)
+        with self.prefetch_lock:
+            self._drop_prefetched(file_path)
+        self.update_tray_menu()
+
+    def clear_recent_files(self):
+        """Empty the recent files list and the prefetch cache"""
+        self.recent_files.clear()
+        with self.prefetch_lock:
+            self.prefetch_cache.clear()
+            self.prefetch_bytes = 0
+        self.update_tray_menu()
+
+    def build_recent_menu(self):
+        """Fill the Open Recent submenu and refresh the prefetch cache"""
+        self.recent_menu.delete(0, 'end')
+        for file_path in self.recent_files:
+            self.recent_menu.add_command(label=file_path,
+                                         command=lambda p=file_path: self.open_path(p))
+        if self.recent_files:
+            self.recent_menu.add_separator()
+            self.recent_menu.add_command(label="Clear Recent", command=self.clear_recent_files)
+        else:
+            self.recent_menu.add_command(label="(none)", state='disabled')
+        self.prefetch_recent_files()
+
+    def recent_tray_items(self):
+        """Tray menu entries for the recent files, rebuilt when the list changes"""
+        return tuple(pystray.MenuItem(os.path.basename(file_path), self._recent_tray_action(file_path))
+                     for file_path in self.recent_files)
+
+    def _recent_tray_action(self, file_path):
+        """Tray callbacks run on the tray thread, so hand the open to Tk"""
+        def action(icon, item):
+            self.post_command(self.show_window)
+            self.post_command(self.open_path, file_path)
+        return action
+
+    def update_tray_menu(self):
+        """Rebuild the tray menu after the recent files changed"""
+        if hasattr(self, 'system_tray'):
+            try:
+                self.system_tray.update_menu()
+            except Exception as e:
+                print(f"Error updating tray menu: {e}")
+
+    def read_recent_file(self, file_path):
+        """Return file content from the prefetch cache if the file is unchanged"""
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        with self.prefetch_lock:
+            entry = self.prefetch_cache.get(file_path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self.prefetch_cache.move_to_end(file_path)
+                self.prefetch_hits += 1
+                return entry[2]
+        
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self._store_prefetched(file_path, stat, content)
+        return content
+
+    def prefetch_recent_files(self):
+        """Load the recent files into the cache on a background thread"""
+        if self.prefetch_running or not self.recent_files:
+            return
+        self.prefetch_running = True
+        thread = threading.Thread(target=self._prefetch_worker, args=(list(self.recent_files),))
+        thread.daemon = True
+        thread.start()
+
+    def _prefetch_worker(self, paths):
+        """Read any recent file whose cached copy is missing or stale"""
+        try:
+            # Only the newest files that fit the budget, or each run evicts what it just read
+            chosen, total = [], 0
+            for file_path in paths:
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                if stat.st_size > self.prefetch_budget:
+                    continue
+                total += stat.st_size
+                if total > self.prefetch_budget:
+                    break
+                chosen.append((file_path, stat))
+            
+            # Oldest first, so the newest files end up most recently used
+            for file_path, stat in reversed(chosen):
+                with self.prefetch_lock:
+                    entry = self.prefetch_cache.get(file_path)
+                    if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                        self.prefetch_cache.move_to_end(file_path)
+                        continue
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+                    self._store_prefetched(file_path, stat, content)
+                except (OSError, UnicodeDecodeError):
+                    continue
+        finally:
+            self.prefetch_running = False
+
+    def _store_prefetched(self, file_path, stat, content):
+        """Cache file content, evicting least recently used entries past the budget"""
+        size = sys.getsizeof(content)
+        with self.prefetch_lock:
+            self._drop_prefetched(file_path)
+            if size > self.prefetch_budget:
+                return
+            self.prefetch_cache[file_path] = (stat.st_mtime_ns, stat.st_size, content, size)
+            self.prefetch_bytes += size
+            while self.prefetch_bytes > self.prefetch_budget:
+                _, evicted = self.prefetch_cache.popitem(last=False)
+                self.prefetch_bytes -= evicted[3]
+
+    def _drop_prefetched(self, file_path):
+        """Remove one cache entry; the caller holds prefetch_lock"""
+        entry = self.prefetch_cache.pop(file_path, None)
+        if entry:
+            self.prefetch_bytes -= entry[3]
+
+
+    def record_copy(self, event):
+        """Add the selection being copied or cut to the clipboard history"""
+        text_area = event.widget
+        if text_area.tag_ranges('sel'):
+            self.record_clipboard(text_area.get('sel.first', 'sel.last'))
+
+    def record_clipboard(self, text):
+        """Push text onto the clipboard history, moving duplicates to the front"""
+        if not text:
+            return
+        key = hashlib.sha1(text.encode('utf-8')).digest()
+        if key in self.clipboard_history:
+            self.clipboard_history.move_to_end(key)
+            return
+        
+        # Large entries are kept compressed
+        if len(text) > self.clipboard_compress_over:
+            data = zlib.compress(text.encode('utf-8'))
+        else:
+            data = text
+        size = sys.getsizeof(data)
+        if size > self.clipboard_budget:
+            return
+        
+        preview = ' '.join(text[:200].split())[:60]
+        self.clipboard_history[key] = (data, len(text), preview, size)
+        self.clipboard_bytes += size
+        while (len(self.clipboard_history) > self.clipboard_history_size
+               or self.clipboard_bytes > self.clipboard_budget):
+            _, evicted = self.clipboard_history.popitem(last=False)
+            self.clipboard_bytes -= evicted[3]
+
+    def clipboard_entry(self, key):
+        """Return the full text of a clipboard history entry"""
+        data = self.clipboard_history[key][0]
+        return zlib.decompress(data).decode('utf-8') if isinstance(data, bytes) else data
+
+    def show_clipboard_history(self, event=None):
+        """Show a quick-pick list of recent copies to paste into the current tab"""
+        if not self.clipboard_history or not self.current_tab:
+            return 'break'
+        
+        if self.clipboard_popup is None:
+            self.clipboard_popup = tk.Toplevel(self.root)
+            self.clipboard_popup.wm_overrideredirect(True)
+            self.clipboard_popup.attributes('-topmost', True)
+            self.clipboard_list = tk.Listbox(self.clipboard_popup, bg='black', fg='white',
+                                             selectbackground='gray', activestyle='none',
+                                             width=50, exportselection=False)
+            self.clipboard_list.pack()
+            self.clipboard_list.bind('<Return>', self.paste_clipboard_entry)
+            self.clipboard_list.bind('<Double-Button-1>', self.paste_clipboard_entry)
+            self.clipboard_list.bind('<Escape>', lambda e: self.clipboard_popup.withdraw())
+            self.clipboard_list.bind('<FocusOut>', lambda e: self.clipboard_popup.withdraw())
+        
+        # Most recent copy first
+        self.clipboard_keys = list(reversed(self.clipboard_history))
+        self.clipboard_list.delete(0, tk.END)
+        for key in self.clipboard_keys:
+            data, length, preview, size = self.clipboard_history[key]
+            label = preview if length <= len(preview) else f"{preview}... ({length:,} chars)"
+            self.clipboard_list.insert(tk.END, label)
+        self.clipboard_list.configure(height=min(len(self.clipboard_keys), 10))
+        self.clipboard_list.selection_set(0)
+        self.clipboard_list.activate(0)
+        
+        text_area = self.tabs[self.current_tab]['text_area']
+        bbox = text_area.bbox('insert')
+        x, y = text_area.winfo_rootx(), text_area.winfo_rooty()
+        if bbox:
+            x, y = x + bbox[0], y + bbox[1] + bbox[3]
+        self.clipboard_popup.wm_geometry(f"+{x}+{y}")
+        self.clipboard_popup.deiconify()
+        self.clipboard_popup.lift()
+        self.clipboard_list.focus_set()
+        return 'break'
+
+    def paste_clipboard_entry(self, event=None):
+        """Paste the picked clipboard history entry into the current tab"""
+        selection = self.clipboard_list.curselection()
+        self.clipboard_popup.withdraw()
+        if not selection or not self.current_tab:
+            return 'break'
+        
+        key = self.clipboard_keys[selection[0]]
+        text = self.clipboard_entry(key)
+        self.clipboard_history.move_to_end(key)
+        
+        # Big entries go through the chunked insert like any other paste
+        text_area = self.tabs[self.current_tab]['text_area']
+        text_area.focus_set()
+        replace = ('sel.first', 'sel.last') if text_area.tag_ranges('sel') else None
+        self.insert_text(text_area, 'insert', text, replace=replace)
+        text_area.see('insert')
+        return 'break'
+
+
+    def post_command(self, func, *args):
+        """Queue a call to run on the Tk thread; safe to use from any thread"""
+        self.commands.put((time.perf_counter(), func, args))
+
+    def _tray_command(self, func):
+        """Wrap a method as a tray callback that hands it to the Tk thread"""
+        return lambda icon, item: self.post_command(func)
+
+    def _drain_commands(self):
+        """Run queued commands for a few milliseconds, then poll again"""
+        stats = self.command_stats
+        depth = self.commands.qsize()
+        stats['depth_max'] = max(stats['depth_max'], depth)
+        
+        started = time.perf_counter()
+        handled = 0
+        while time.perf_counter() - started < 0.01:
+            try:
+                posted, func, args = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            latency = time.perf_counter() - posted
+            stats['count'] += 1
+            stats['latency_total'] += latency
+            stats['latency_max'] = max(stats['latency_max'], latency)
+            handled += 1
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"Error running queued command: {e}")
+        
+        # Poll quickly while busy and back off when idle
+        if not self.commands.empty():
+            self.command_interval = 1
+        elif handled:
+            self.command_interval = 10
+        else:
+            self.command_interval = min(self.command_interval * 2, 100)
+        try:
+            self.root.after(self.command_interval, self._drain_commands)
+        except tk.TclError:
+            pass  # the window is gone
+
+
+    def export_note(self):
+        """Export the current tab with its formatting as HTML, RTF or Markdown"""
+        if not self.current_tab:
+            return
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".html",
+            initialfile=os.path.splitext(self.current_tab)[0],
+            filetypes=[
+                ("HTML", "*.html"),
+                ("Rich Text", "*.rtf"),
+                ("Markdown", "*.md")
+            ]
+        )
+        if not file_path:
+            return
+        
+        writers = {'.rtf': self._export_rtf, '.md': self._export_markdown}
+        writer = writers.get(os.path.splitext(file_path)[1].lower(), self._export_html)
+        text_area = self.tabs[self.current_tab]['text_area']
+        try:
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                for piece in writer(text_area):
+                    f.write(piece)
+        except Exception as e:
+            print(f"Error exporting file: {e}")
+
+    def _format_runs(self, text_area, chunk_lines=500):
+        """Yield (text, background, underline color) runs, dumping a few lines at a time"""
+        colors = {}
+        active = {}
+        last_line = int(text_area.index('end-1c').split('.')[0])
+        for line in range(1, last_line + 1, chunk_lines):
+            end = f"{line + chunk_lines}.0" if line + chunk_lines <= last_line else 'end-1c'
+            for key, value, index in text_area.dump(f"{line}.0", end, text=True, tag=True):
+                if key == 'text':
+                    yield value, active.get('highlight_'), active.get('underline_')
+                    continue
+                kind = 'highlight_' if value.startswith('highlight_') else 'underline_'
+                if not value.startswith(kind):
+                    continue  # selection, spell check and other internal tags
+                
+                # Each chunk reports tags already open at its start again
+                if key == 'tagon':
+                    if value not in colors:
+                        option = 'background' if kind == 'highlight_' else 'underlinefg'
+                        colors[value] = str(text_area.tag_cget(value, option)) or None
+                    active[kind] = colors[value]
+                elif key == 'tagoff' and active.get(kind) == colors.get(value):
+                    del active[kind]
+
+    def _export_html(self, text_area):
+        """Stream the note as an HTML page"""
+        family = self.settings.get('font', 'Arial')
+        yield ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+               f"<title>{html.escape(self.current_tab)}</title>\n</head>\n<body>\n"
+               f"<pre style=\"white-space: pre-wrap; font-family: '{html.escape(family)}', sans-serif\">")
+        for text, background, underline in self._format_runs(text_area):
+            styles = []
+            if background:
+                styles.append(f"background-color: {background}")
+            if underline:
+                styles.append(f"text-decoration: underline {underline}")
+            if styles:
+                yield f"<span style=\"{'; '.join(styles)}\">{html.escape(text)}</span>"
+            else:
+                yield html.escape(text)
+        yield "</pre>\n</body>\n</html>\n"
+
+    def _export_markdown(self, text_area):
+        """Stream the note as Markdown, with inline HTML for the formatting"""
+        for text, background, underline in self._format_runs(text_area):
+            if not background and not underline:
+                yield self._markdown_escape(text)
+                continue
+            
+            # Inline tags cannot span paragraphs, so wrap each line separately
+            for i, part in enumerate(text.split('\n')):
+                if i:
+                    yield '\n'
+                if not part:
+                    continue
+                part = self._markdown_escape(part)
+                if underline:
+                    part = f"<u style=\"text-decoration-color: {underline}\">{part}</u>"
+                if background:
+                    part = f"<mark style=\"background-color: {background}\">{part}</mark>"
+                yield part
+
+    def _markdown_escape(self, text):
+        """Escape text so HTML and inline Markdown in a note stay literal"""
+        return MARKDOWN_SPECIAL_RE.sub(r"\\\1", html.escape(text, quote=False))
+
+    def _export_rtf(self, text_area):
+        """Stream the note as an RTF document"""
+        # RTF needs its colour table up front, so collect colours from the tag configs
+        table = {}
+        for tag in text_area.tag_names():
+            if tag.startswith('highlight_'):
+                color = str(text_area.tag_cget(tag, 'background'))
+            elif tag.startswith('underline_'):
+                color = str(text_area.tag_cget(tag, 'underlinefg'))
+            else:
+                continue
+            if color and color not in table:
+                table[color] = len(table) + 1
+        
+        color_defs = ''.join(
+            "\\red%d\\green%d\\blue%d;" % tuple(c // 257 for c in text_area.winfo_rgb(color))
+            for color in table)
+        family = self.settings.get('font', 'Arial')
+        yield f"{{\\rtf1\\ansi\\deff0{{\\fonttbl{{\\f0 {family};}}}}{{\\colortbl ;{color_defs}}}\n"
+        
+        for text, background, underline in self._format_runs(text_area):
+            escaped = []
+            for char in text:
+                code = ord(char)
+                if char in '\\{}':
+                    escaped.append('\\' + char)
+                elif char == '\n':
+                    escaped.append('\\par\n')
+                elif char == '\t':
+                    escaped.append('\\tab ')
+                elif code < 128:
+                    escaped.append(char)
+                elif code < 0x10000:
+                    escaped.append(f"\\u{code if code < 0x8000 else code - 0x10000}?")
+                else:
+                    code -= 0x10000  # surrogate pair
+                    for unit in (0xD800 + (code >> 10), 0xDC00 + (code & 0x3FF)):
+                        escaped.append(f"\\u{unit - 0x10000}?")
+            escaped = ''.join(escaped)
+            
+            controls = ''
+            if background in table:
+                controls += f"\\highlight{table[background]}\\chcbpat{table[background]}"
+            if underline:
+                controls += f"\\ul\\ulc{table.get(underline, 0)}"
+            yield f"{{{controls} {escaped}}}" if controls else escaped
+        yield "}\n"
+
+
+    def open_folder(self):
+        """Pick a folder to index and browse with the quick open finder"""
+        folder = filedialog.askdirectory()
+        if folder:
+            self.load_workspace(os.path.abspath(folder))
+            self.show_quick_open()
+
+    def load_workspace(self, folder):
+        """Start indexing a folder; the cached index is usable before the scan ends"""
+        if self.workspace_job is not None:
+            self.workspace_job['cancel'].set()
+        self.workspace_dir = folder
+        self.workspace_files = []
+        self.finder_query = None
+        self.workspace_job = {'cancel': threading.Event(), 'done': False}
+        
+        thread = threading.Thread(target=self._index_worker,
+                                  args=(self.workspace_job, folder, self.workspace_hashes))
+        thread.daemon = True
+        thread.start()
+
+    def _workspace_index_path(self, folder):
+        key = hashlib.sha1(os.path.normcase(folder).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(os.getenv('APPDATA'), 'TransparentNotes', 'workspaces', f"{key}.json")
+
+    def _index_worker(self, job, folder, hash_files):
+        """Walk a folder recording size, mtime and optionally a content hash (worker thread)"""
+        index_path = self._workspace_index_path(folder)
+        cached = {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)['files']
+            self.post_command(self._set_workspace_files, job, sorted(cached), False)
+        except (OSError, ValueError, KeyError):
+            pass
+        
+        files = {}
+        prefix = os.path.join(folder, '')
+        pending = [folder]
+        while pending:
+            if job['cancel'].is_set():
+                return
+            try:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.name.startswith('.'):
+                            continue  # .git and other hidden folders
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                        
+                        stat = entry.stat()
+                        path = entry.path[len(prefix):]
+                        previous = cached.get(path)
+                        digest = None
+                        if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+                            digest = previous[2]
+                        if hash_files and digest is None:
+                            digest = self._hash_file(entry.path)
+                        files[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            except OSError:
+                continue
+        
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'root': folder, 'files': files}, f)
+            os.replace(index_path + '.tmp', index_path)
+        except OSError as e:
+            print(f"Error saving folder index: {e}")
+        self.post_command(self._set_workspace_files, job, sorted(files), True)
+
+    def _hash_file(self, file_path):
+        """SHA-1 of a file's content, read in blocks"""
+        digest = hashlib.sha1()
+        try:
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+        except OSError:
+            return None
+        return digest.hexdigest()
+
+    def _set_workspace_files(self, job, files, done):
+        """Take a new file list from the indexer and refresh an open finder"""
+        if job is not self.workspace_job:
+            return
+        job['done'] = done
+        self.workspace_files = files
+        self.finder_query = None
+        if self.finder_popup is not None and self.finder_popup.winfo_ismapped():
+            self.update_quick_open()
+
+    def show_quick_open(self, event=None):
+        """Show the fuzzy file finder for the open folder"""
+        if not self.workspace_dir:
+            self.open_folder()
+            return 'break'
+        
+        if self.finder_popup is None:
+            self.finder_popup = tk.Toplevel(self.root, bg='black')
+            self.finder_popup.wm_overrideredirect(True)
+            self.finder_popup.attributes('-topmost', True)
+            self.finder_entry = tk.Entry(self.finder_popup, bg='black', fg='white',
+                                         insertbackground='white')
+            self.finder_entry.pack(fill='x', padx=2, pady=2)
+            self.finder_list = tk.Listbox(self.finder_popup, bg='black', fg='white',
+                                          selectbackground='gray', activestyle='none',
+                                          height=12, exportselection=False)
+            self.finder_list.pack(fill='both', expand=True, padx=2)
+            self.finder_status = tk.Label(self.finder_popup, bg='black', fg='gray', anchor='w',
+                                          font=('Arial', 8))
+            self.finder_status.pack(fill='x', padx=2)
+            
+            self.finder_entry.bind('<KeyRelease>', self.update_quick_open)
+            self.finder_entry.bind('<Up>', lambda e: self.move_quick_open(-1))
+            self.finder_entry.bind('<Down>', lambda e: self.move_quick_open(1))
+            self.finder_entry.bind('<Return>', self.accept_quick_open)
+            self.finder_entry.bind('<Escape>', lambda e: self.finder_popup.withdraw())
+            self.finder_list.bind('<Double-Button-1>', self.accept_quick_open)
+        
+        width = max(self.root.winfo_width() - 40, 200)
+        x, y = self.root.winfo_rootx() + 20, self.root.winfo_rooty() + 30
+        self.finder_popup.wm_geometry(f"{width}x260+{x}+{y}")
+        self.finder_entry.delete(0, tk.END)
+        self.finder_query = None
+        self.update_quick_open()
+        self.finder_popup.deiconify()
+        self.finder_popup.lift()
+        self.finder_entry.focus_force()
+        return 'break'
+
+    def update_quick_open(self, event=None):
+        """Refilter the finder list for the typed query"""
+        if event is not None and event.keysym in ('Up', 'Down', 'Return', 'Escape'):
+            return
+        query = self.finder_entry.get().strip()
+        if query == self.finder_query:
+            return
+        
+        # A longer query can only match a subset of the previous matches
+        if self.finder_query and query.startswith(self.finder_query):
+            candidates = self.finder_candidates
+        else:
+            candidates = self.workspace_files
+        self.finder_candidates = self._fuzzy_filter(query, candidates)
+        self.finder_query = query
+        
+        self.finder_list.delete(0, tk.END)
+        self.finder_shown = self._best_matches(query, self.finder_candidates)
+        for path in self.finder_shown:
+            self.finder_list.insert(tk.END, path)
+        if self.finder_shown:
+            self.finder_list.selection_set(0)
+        
+        status = f"{len(self.finder_candidates):,} of {len(self.workspace_files):,} files"
+        if not self.workspace_job['done']:
+            status += " (indexing...)"
+        self.finder_status.configure(text=f"{self.workspace_dir}  {status}")
+
+    def _fuzzy_span(self, query, text):
+        """Tightest (start, end) of the query's characters in order, or None.
+        
+        A forward scan finds where the earliest match ends and a backward scan
+        from there finds the latest start, so the cost stays linear in the text.
+        """
+        end = -1
+        for char in query:
+            end = text.find(char, end + 1)
+            if end == -1:
+                return None
+        start = end + 1
+        for char in reversed(query):
+            start = text.rfind(char, 0, start)
+        return start, end + 1
+
+    def _fuzzy_filter(self, query, paths):
+        """Paths containing the query's characters in order, case-insensitively"""
+        if not query:
+            return paths
+        query = query.lower()
+        matches = []
+        for path in paths:
+            # Plain finds instead of a regex, which backtracks badly on near misses
+            lower, position = path.lower(), -1
+            for char in query:
+                position = lower.find(char, position + 1)
+                if position == -1:
+                    break
+            else:
+                matches.append(path)
+        return matches
+
+    def _best_matches(self, query, paths, limit=50):
+        """Rank matches: file name hits first, then tighter matches, then shorter paths"""
+        if not query:
+            return paths[:limit]
+        query = query.lower()
+        
+        def score(path):
+            span = self._fuzzy_span(query, os.path.basename(path).lower())
+            if span:
+                return (0, span[1] - span[0], len(path))
+            span = self._fuzzy_span(query, path.lower())
+            return (1, span[1] - span[0], len(path))
+        return heapq.nsmallest(limit, paths, key=score)
+
+    def move_quick_open(self, step):
+        """Move the finder selection from the query entry"""
+        selection = self.finder_list.curselection()
+        position = max(0, min(self.finder_list.size() - 1, (selection[0] if selection else 0) + step))
+        self.finder_list.selection_clear(0, tk.END)
+        self.finder_list.selection_set(position)
+        self.finder_list.see(position)
+        return 'break'
+
+    def accept_quick_open(self, event=None):
+        """Open the picked file in a tab"""
+        selection = self.finder_list.curselection()
+        self.finder_popup.withdraw()
+        if selection:
+            self.open_path(os.path.join(self.workspace_dir, self.finder_shown[selection[0]]))
+        return 'break'
+
+
 if __name__ == "__main__":
     try:
         notes = TransparentNotes()